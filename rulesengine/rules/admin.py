@@ -1,4 +1,3 @@
-from functools import lru_cache
 from itertools import chain
 
 import urlcanon
@@ -18,11 +17,15 @@ from djangoql.schema import (
     StrField,
 )
 
-from .models import Rule, RuleChange
+from .models import ArchivedRule, Rule, RuleChange
+from .utils.archive import restore_rules
+from .utils.cache import versioned_cache
+from .utils.json import get_summary_cache
+from .utils.ruleset import get_ruleset
 from rulesengine import settings
 
 
-@lru_cache(maxsize=1)
+@versioned_cache
 def get_surt_part_tree():
     """Return a tree-like representation of the all rule SURTs as a dict with
     protocol and SURT part keys.
@@ -85,6 +88,8 @@ def purge_rule_data_caches(func):
 
     def f(*args, **kwargs):
         get_surt_part_tree.cache_clear()
+        get_ruleset.cache_clear()
+        get_summary_cache.cache_clear()
         return func(*args, **kwargs)
 
     return f
@@ -340,5 +345,22 @@ class RuleAdmin(DjangoQLSearchMixin, admin.ModelAdmin):
         return response
 
 
+class ArchivedRuleAdmin(admin.ModelAdmin):
+    list_display = ("surt", "policy", "enabled", "retrieve_date_end", "archived_date")
+    actions = ["restore"]
+
+    @purge_rule_data_caches
+    def restore(self, request, queryset):
+        """Move the selected archived rules back to the rules table."""
+        restored = restore_rules(
+            list(queryset.values_list("id", flat=True)),
+            user=request.user.get_username(),
+        )
+        self.message_user(request, "Restored {} rule(s).".format(len(restored)))
+
+    restore.short_description = "Restore selected archived rules"
+
+
 admin.site.register(Rule, RuleAdmin)
 admin.site.register(RuleChange)
+admin.site.register(ArchivedRule, ArchivedRuleAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RulesConfig(AppConfig):
     default_auto_field = "django.db.models.AutoField"
     name = "rules"
+
+    def ready(self):
+        # Connect the signal receivers.
+        import rules.utils.serving  # noqa: F401
@@ -0,0 +1,100 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from rules.utils.archive import (
+    archivable_rules,
+    archive_rules,
+    restore_rules,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves rules which have been disabled or expired for long enough to "
+        "the archive table, or restores archived rules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--disabled-days",
+            type=int,
+            default=getattr(settings, "RULES_ARCHIVE_DISABLED_DAYS", 90),
+            help=(
+                "Archive disabled rules left unchanged for this many days "
+                "(default: RULES_ARCHIVE_DISABLED_DAYS), or -1 to keep them."
+            ),
+        )
+        parser.add_argument(
+            "--expired-days",
+            type=int,
+            default=getattr(settings, "RULES_ARCHIVE_EXPIRED_DAYS", 30),
+            help=(
+                "Archive rules whose retrieval window closed this many days "
+                "ago (default: RULES_ARCHIVE_EXPIRED_DAYS), or -1 to keep them."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the rules which are due to be archived without moving them.",
+        )
+        parser.add_argument(
+            "--restore",
+            nargs="+",
+            type=int,
+            metavar="ID",
+            help="Restore the archived rules with these ids instead.",
+        )
+        parser.add_argument(
+            "--every",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, archiving rules every this many seconds.",
+        )
+        parser.add_argument(
+            "--user",
+            default="archive_rules",
+            help="The user recorded in the rule changes.",
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs["restore"]:
+            restored = restore_rules(kwargs["restore"], user=kwargs["user"])
+            self.stdout.write(
+                "Restored {} rule(s): {}".format(
+                    len(restored), " ".join(map(str, restored))
+                )
+            )
+            return
+        while True:
+            self.archive(kwargs)
+            if kwargs["every"] is None:
+                return
+            time.sleep(kwargs["every"])
+            close_old_connections()
+
+    def archive(self, kwargs):
+        rules = archivable_rules(
+            disabled_days=(
+                kwargs["disabled_days"] if kwargs["disabled_days"] >= 0 else None
+            ),
+            expired_days=(
+                kwargs["expired_days"] if kwargs["expired_days"] >= 0 else None
+            ),
+        )
+        if kwargs["dry_run"]:
+            count = 0
+            for rule in rules.iterator():
+                self.stdout.write("{}\t{}".format(rule.id, rule))
+                count += 1
+            self.stdout.write("{} rule(s) are due to be archived".format(count))
+            return
+        archived = archive_rules(
+            rules,
+            user=kwargs["user"],
+            comment="Disabled or expired for long enough to be archived",
+        )
+        self.stdout.write("Archived {} rule(s)".format(len(archived)))
@@ -1,22 +1,86 @@
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
 import timeit
 
 from django.core.management.base import BaseCommand
+from django.test import (
+    RequestFactory,
+    override_settings,
+)
 
+from rules.models import (
+    Rule,
+    RuleChange,
+)
+from rules.utils.json import (
+    ENCODERS,
+    orjson,
+    success,
+)
 from rules.views import rules_for_surt as rules_view
 
 
 class Command(BaseCommand):
     help = "Performs basic benchmarks against the application."
 
-    def handle(self, *args, **kwargs):
+    def time(self, label, func, number):
+        """Run a function a number of times and report its average execution
+        time in milliseconds."""
+        total = timeit.Timer(func).timeit(number=number)
         self.stdout.write(
-            "{:>50}  {}".format("Test (1000x)", "Avg. execution time (ms)")
+            "{:>50}  {}".format("{} ({}x)".format(label, number), total * 1000 / number)
         )
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("{:>50}  {}".format("Test", "Avg. execution time (ms)"))
         self.stdout.write("-" * 80)
 
-        t = timeit.Timer(lambda: rules_view(None, "com,example0)/path"))
-        self.stdout.write(
-            "{:>50}  {}".format(
-                "rules view - http://(com,example0)/path", t.timeit(number=1000)
-            )
+        request = RequestFactory().get("/rules/tree/com,example0)/path")
+        self.time(
+            "rules view - http://(com,example0)/path",
+            lambda: rules_view(request, "com,example0)/path"),
+            1000,
         )
+
+        # Encoding a large /rules result and a datetime-heavy page of rule
+        # changes, with each JSON encoder.
+        now = datetime.now(timezone.utc)
+        summaries = [
+            Rule(
+                id=i,
+                surt="http://(com,example{},)/path".format(i),
+                policy="block",
+                capture_date_start=now,
+                capture_date_end=now + timedelta(days=i),
+                retrieve_date_start=now,
+                collection="collection{}".format(i),
+            ).summary()
+            for i in range(10000)
+        ]
+        changes = [
+            dict(
+                RuleChange(
+                    id=i,
+                    rule_id=i,
+                    change_date=now - timedelta(minutes=i),
+                    change_type="u",
+                ).change_summary(),
+                capture_date_start=now - timedelta(days=i),
+                capture_date_end=now + timedelta(days=i),
+                retrieve_date_start=now,
+            )
+            for i in range(10000)
+        ]
+        for name in ENCODERS:
+            if name == "orjson" and orjson is None:
+                continue
+            with override_settings(RULES_JSON_ENCODER=name):
+                for label, payload in (("rules", summaries), ("changes", changes)):
+                    self.time(
+                        "{} encoder - 10000 {}".format(name, label),
+                        lambda: success(payload),
+                        10,
+                    )
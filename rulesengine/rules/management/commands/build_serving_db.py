@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from rules.utils.serving import (
+    ServingDatabaseError,
+    build_serving_db,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles the enabled rules into a read-only SQLite serving database, "
+        "which replaces the existing one atomically (see RULES_SERVING_DB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output",
+            nargs="?",
+            help="The serving database file (default: RULES_SERVING_DB).",
+        )
+
+    def handle(self, *args, **kwargs):
+        path = kwargs["output"] or getattr(settings, "RULES_SERVING_DB", None)
+        if not path:
+            raise CommandError("no output file given and RULES_SERVING_DB isn't set")
+        try:
+            version = build_serving_db(path)
+        except ServingDatabaseError as e:
+            raise CommandError(str(e))
+        self.stdout.write("Wrote ruleset version {} to {}".format(version, path))
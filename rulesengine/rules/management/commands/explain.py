@@ -0,0 +1,88 @@
+import re
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from rules.models import Rule
+from rules.views import (
+    RulesView,
+    rules_query,
+    rules_query_batch,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints the query plans (EXPLAIN) of the rules table queries which rule "
+        "lookups, /rules and the admin changelist run against the current "
+        "database, to check which indexes they use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--surt",
+            default="https://(org,archive,)/",
+            help="The SURT to look up, and the SURT prefix to list rules by.",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run the queries and report their actual costs (PostgreSQL).",
+        )
+
+    def handle(self, *args, **kwargs):
+        surt = kwargs["surt"]
+        options = {"analyze": True} if kwargs["analyze"] else {}
+        try:
+            prefix = connection.ops.explain_query_prefix(**options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        factory = RequestFactory()
+        self.explain(prefix, "rules_query", lambda: list(rules_query(surt)))
+        self.explain(
+            prefix,
+            "rules_query_batch",
+            lambda: list(rules_query_batch([{"surt": surt, "capture-date": None}])),
+        )
+        self.explain(
+            prefix,
+            "RulesView.get (a page of surt-start)",
+            lambda: RulesView.as_view()(
+                factory.get("/rules", {"surt-start": surt, "limit": 100})
+            ),
+        )
+        self.explain(prefix, "admin changelist", lambda: self.admin_changelist(factory))
+
+    def admin_changelist(self, factory):
+        request = factory.get("/admin/rules/rule/")
+        request.user = User(is_active=True, is_staff=True, is_superuser=True)
+        changelist = admin.site._registry[Rule].get_changelist_instance(request)
+        list(changelist.result_list)
+
+    def explain(self, prefix, label, run):
+        """Run a function and print the plan of each query of the rules
+        table it made.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        table = re.compile(r"\b{}\b".format(Rule._meta.db_table))
+        for query in queries:
+            sql = query["sql"]
+            if not table.search(sql) or not sql.lstrip().upper().startswith(
+                ("SELECT", "WITH")
+            ):
+                continue
+            self.stdout.write("== {}".format(label))
+            self.stdout.write(sql)
+            with connection.cursor() as cursor:
+                cursor.execute("{} {}".format(prefix, sql))
+                for row in cursor.fetchall():
+                    self.stdout.write("  " + " ".join(str(column) for column in row))
+            self.stdout.write("")
@@ -0,0 +1,48 @@
+import shutil
+import sys
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError,
+)
+
+from rules.utils.snapshot import (
+    SnapshotError,
+    get_snapshot,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes a snapshot of every enabled rule (gzip compressed NDJSON, "
+        "tagged with the ruleset version), as served by /rules/snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output",
+            nargs="?",
+            default="-",
+            help="The file to write the snapshot to (default: standard output).",
+        )
+        parser.add_argument(
+            "--directory",
+            help="The snapshot cache directory (default: RULES_SNAPSHOT_DIR).",
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            version, snapshot = get_snapshot(kwargs["directory"])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        with snapshot:
+            if kwargs["output"] == "-":
+                shutil.copyfileobj(snapshot, sys.stdout.buffer)
+            else:
+                with open(kwargs["output"], "wb") as output:
+                    shutil.copyfileobj(snapshot, output)
+                self.stderr.write(
+                    "Wrote the snapshot of ruleset version {} to {}".format(
+                        version, kwargs["output"]
+                    )
+                )
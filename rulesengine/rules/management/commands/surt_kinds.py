@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from rules.models import Rule
+from rules.utils.matcher import (
+    KINDS,
+    WILDCARD,
+    SurtMatcher,
+    like_dialect,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports how many rule SURTs are matched exactly, as prefixes, or as "
+        "wildcard patterns (which are matched with slower regular expressions)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--list-wildcards",
+            action="store_true",
+            help="List the rules with wildcard SURT patterns.",
+        )
+
+    def handle(self, *args, **kwargs):
+        matcher = SurtMatcher(dialect=like_dialect())
+        wildcards = []
+        for rule_id, surt in Rule.objects.values_list("id", "surt").iterator():
+            if matcher.add(rule_id, surt) == WILDCARD:
+                wildcards.append((rule_id, surt))
+        counts = matcher.stats()
+        total = sum(counts.values())
+        self.stdout.write("{:>10}  {:>10}  {:>7}".format("Kind", "Rules", "%"))
+        self.stdout.write("-" * 31)
+        for kind in KINDS:
+            self.stdout.write(
+                "{:>10}  {:>10}  {:>7.2f}".format(
+                    kind, counts[kind], 100.0 * counts[kind] / total if total else 0
+                )
+            )
+        if kwargs["list_wildcards"]:
+            self.stdout.write("")
+            for rule_id, surt in wildcards:
+                self.stdout.write("{:>10}  {}".format(rule_id, surt))
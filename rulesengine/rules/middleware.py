@@ -0,0 +1,81 @@
+import asyncio
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from rules.routers import (
+    STICKY_PRIMARY_COOKIE,
+    record_writes,
+)
+from rules.utils.compression import compress_response
+
+
+@sync_and_async_middleware
+def async_lookup_middleware(get_response):
+    """Route requests served over ASGI to the URLconf of the async views,
+    by default `rulesengine.asgi_urls`, so rule lookups don't hold a thread
+    while they wait. Requests served over WSGI are left alone.
+    """
+    if not asyncio.iscoroutinefunction(get_response):
+        return get_response
+
+    async def middleware(request):
+        request.urlconf = getattr(
+            settings, "RULES_ASYNC_URLCONF", "rulesengine.asgi_urls"
+        )
+        return await get_response(request)
+
+    return middleware
+
+
+@sync_and_async_middleware
+def compression_middleware(get_response):
+    """Compress API responses with the best content coding (zstd, brotli or
+    gzip) the client accepts, see `rules.utils.compression.compress_response`.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            return compress_response(request, await get_response(request))
+
+    else:
+
+        def middleware(request):
+            return compress_response(request, get_response(request))
+
+    return middleware
+
+
+def _stick_to_primary(response, writes):
+    if writes and getattr(settings, "RULES_READ_REPLICAS", ()):
+        response.set_cookie(
+            STICKY_PRIMARY_COOKIE,
+            "1",
+            max_age=getattr(settings, "RULES_REPLICA_STICKY_SECONDS", 10),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+@sync_and_async_middleware
+def sticky_primary_middleware(get_response):
+    """Give clients which wrote to the database a cookie which makes them read
+    from the primary rather than a replica (see `rules.routers`) for
+    RULES_REPLICA_STICKY_SECONDS, so they see their own writes.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            with record_writes() as writes:
+                response = await get_response(request)
+            return _stick_to_primary(response, writes)
+
+    else:
+
+        def middleware(request):
+            with record_writes() as writes:
+                response = get_response(request)
+            return _stick_to_primary(response, writes)
+
+    return middleware
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.6 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+def create_ruleset_version(apps, schema_editor):
+    RulesetVersion = apps.get_model('rules', 'RulesetVersion')
+    RulesetVersion.objects.create(pk=1, version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0016_auto_20240727_2341'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RulesetVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_ruleset_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.6 on 2026-10-16 23:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0017_rulesetversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rulechange',
+            name='version',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='rulechange',
+            name='change_type',
+            field=models.CharField(choices=[('c', 'created'), ('u', 'updated'), ('d', 'deleted')], max_length=1),
+        ),
+        migrations.AlterField(
+            model_name='rulechange',
+            name='rule',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='rule_change', to='rules.rule'),
+        ),
+    ]
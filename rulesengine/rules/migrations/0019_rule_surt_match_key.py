@@ -0,0 +1,78 @@
+# Generated by Django 3.2.6 on 2026-10-17 00:00
+
+from django.db import migrations, models
+import re
+
+# A copy of the match key derivation in rules.utils.matcher as of this
+# migration, so that later changes to it don't change what is backfilled.
+_TOKEN_RE = re.compile(r'[)/?#]?[^(,)/?#]*[(,]?')
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def surt_match_key(surt, case_insensitive, escape):
+    literal = []
+    has_wildcard = False
+    chars = iter(surt)
+    for char in chars:
+        if char == escape:
+            # A trailing escape character is taken literally.
+            literal.append(next(chars, char))
+        elif char in '%_':
+            has_wildcard = True
+            break
+        else:
+            literal.append(char)
+    literal = ''.join(literal)
+    if case_insensitive:
+        literal = literal.translate(_ASCII_LOWER)
+    if not has_wildcard:
+        return literal, False
+    tokens = [token for token in _TOKEN_RE.findall(literal) if token]
+    # The last token is only complete if nothing can be appended to it.
+    if tokens and not tokens[-1].endswith(('(', ',')):
+        tokens.pop()
+    return ''.join(tokens), True
+
+
+def backfill_surt_match_keys(apps, schema_editor):
+    Rule = apps.get_model('rules', 'Rule')
+    # How the database evaluates LIKE patterns: SQLite ignores the case of
+    # ASCII letters and has no escape character, PostgreSQL the opposite.
+    if schema_editor.connection.vendor == 'sqlite':
+        case_insensitive, escape = True, None
+    else:
+        case_insensitive, escape = False, '\\'
+    rules = []
+    for rule in Rule.objects.only('id', 'surt').iterator():
+        rule.surt_prefix, rule.surt_has_wildcard = surt_match_key(
+            rule.surt, case_insensitive, escape)
+        rules.append(rule)
+        if len(rules) == 1000:
+            Rule.objects.bulk_update(rules, ['surt_prefix', 'surt_has_wildcard'])
+            rules = []
+    Rule.objects.bulk_update(rules, ['surt_prefix', 'surt_has_wildcard'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0018_rulechange_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rule',
+            name='surt_has_wildcard',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='rule',
+            name='surt_prefix',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='rule',
+            index=models.Index(fields=['surt_prefix'], name='rules_rule_surt_pr_b0dbc1_idx'),
+        ),
+        migrations.RunPython(backfill_surt_match_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.6 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0019_rule_surt_match_key'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rule',
+            name='rules_rule_surt_014cd0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='rule',
+            name='rules_rule_surt_pr_b0dbc1_idx',
+        ),
+        migrations.AddIndex(
+            model_name='rule',
+            index=models.Index(fields=['surt', 'id'], name='rules_rule_surt_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rule',
+            index=models.Index(fields=['surt', 'protocol', 'id'], name='rules_rule_surt_proto_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rule',
+            index=models.Index(condition=models.Q(('enabled', True)), fields=['surt_prefix', 'surt_has_wildcard', 'collection', 'partner'], name='rules_rule_enabled_match_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2.6 on 2026-10-17 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0020_rule_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRule',
+            fields=[
+                ('policy', models.CharField(choices=[('block', 'Block playback'), ('message', 'Block playback with message'), ('allow', 'Allow playback'), ('auth', 'Require auth for playback'), ('rewrite-all', 'Rewrite playback for the entire page'), ('rewrite-js', 'Rewrite playback JavaScript'), ('rewrite-headers', 'Rewrite playback headers')], help_text='What action the Wayback Machine should take on encountering this rule', max_length=15)),
+                ('surt', models.TextField(help_text='The SURT (or partial SURT) to which this rule applies. This may be an incomplete SURT which will be matched for a more specific URL.', verbose_name='SURT')),
+                ('neg_surt', models.TextField(blank=True, help_text='A SURT to use as an exception (i.e: if you want to use the rewrite_from/rewrite_to fields on a broad-scope SURT, -except- a subset, that subset would be represented here)', verbose_name='SURT negation')),
+                ('protocol', models.TextField(blank=True, help_text='The protocol to apply this rule to.')),
+                ('subdomain', models.TextField(blank=True, help_text='The canonicalized-away subdomain, like www, to apply this rule to.')),
+                ('status_code', models.IntegerField(blank=True, help_text='HTTP status code, like 200, 403, 500, to apply this rule to.', null=True)),
+                ('content_type', models.TextField(blank=True, help_text='Content-Type, like text/html, image/gif, to apply this rule to.', null=True)),
+                ('capture_date_start', models.DateTimeField(blank=True, help_text='The earliest date of capture to start applying this rule.', null=True)),
+                ('capture_date_end', models.DateTimeField(blank=True, help_text='The latest date of capture to apply this rule.', null=True)),
+                ('retrieve_date_start', models.DateTimeField(blank=True, help_text='The earliest date of retrieval to start applying this rule.', null=True)),
+                ('retrieve_date_end', models.DateTimeField(blank=True, help_text='The latest date of retrieval to apply this rule.', null=True)),
+                ('seconds_since_capture', models.IntegerField(blank=True, help_text='Number of seconds after capture to apply this rule.', null=True)),
+                ('ip_range_start', models.GenericIPAddressField(blank=True, help_text='The start of the IP address range to apply this rule to.', null=True)),
+                ('ip_range_end', models.GenericIPAddressField(blank=True, help_text='The end of the IP address range to apply this rule to.', null=True)),
+                ('collection', models.TextField(blank=True, help_text='The collection this rule applies to.')),
+                ('partner', models.TextField(blank=True, help_text='The partner this rule applies to.')),
+                ('warc_match', models.TextField(blank=True, help_text='A regular expression for matching against a WARC name to decide whether or not this rule applies (matching must be done on the client side.)')),
+                ('rewrite_from', models.TextField(blank=True, help_text='Text to match on the page that needs to be rewritten.')),
+                ('rewrite_to', models.TextField(blank=True, help_text='Resulting text for rewrite matches.')),
+                ('private_comment', models.TextField(blank=True, help_text='Explanatory comment visible only to rules engine admins.')),
+                ('public_comment', models.TextField(blank=True, help_text='Publicly visible explanatory comment.')),
+                ('environment', models.TextField(choices=[('prod', 'Production'), ('test', 'Testing/development')], default='prod', help_text="What environment the rule should apply to. Environments limit who can see the effects of a rule (e.g: QA environment means playback QA engineers can see the effects but the public can't).")),
+                ('enabled', models.BooleanField(default=True, help_text='Whether or not the rule is enabled and returned for use.')),
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('archived_date', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['surt'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='rulechange',
+            name='change_type',
+            field=models.CharField(choices=[('c', 'created'), ('u', 'updated'), ('d', 'deleted'), ('a', 'archived'), ('r', 'restored')], max_length=1),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.6 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rules', '0021_archivedrule'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rule',
+            name='rules_rule_enabled_match_idx',
+        ),
+        migrations.AddIndex(
+            model_name='rule',
+            index=models.Index(condition=models.Q(('enabled', True)), fields=['surt_prefix', 'surt_has_wildcard', 'collection', 'partner', 'retrieve_date_start', 'retrieve_date_end'], name='rules_rule_enabled_match_idx'),
+        ),
+    ]
@@ -1,10 +1,25 @@
-from dateutil.parser import parse as parse_date
-
-from django.db import models
+from django.db import (
+    models,
+    transaction,
+)
+from django.db.models import (
+    F,
+    Q,
+)
+from django.db.models.signals import (
+    post_delete,
+    pre_save,
+)
+from django.dispatch import receiver
 
+from rules.utils.matcher import (
+    like_dialect,
+    surt_match_key,
+)
 from rules.utils.validators import (
     ENVIRONMENT_CHOICES,
     POLICY_CHOICES,
+    to_datetime,
     validate_rule_json,
 )
 
@@ -136,14 +151,37 @@ class RuleBase(models.Model):
     class Meta:
         abstract = True
 
-    def populate(self, values):
+    @classmethod
+    def value_fields(cls):
+        """Get the names of the fields rules and rule changes have in common.
+
+        Returns:
+        A list of field attribute names.
+        """
+        return [field.attname for field in RuleBase._meta.fields]
+
+    def set_values(self, values):
+        """Set the fields rules and rule changes have in common.
+
+        Arguments:
+        values -- A dict of values by field attribute name, such as
+            `Rule.loaded_values` returns.
+        """
+        for name in self.value_fields():
+            setattr(self, name, values[name])
+
+    def populate(self, values, validate=True):
         """Given an object á là `summary`, populate the given fields.
 
         Arguments:
         values -- A Python dict containing keys named after the fields in the
             model.
+        validate -- Whether to validate the values first. Callers which
+            already did should pass the values `validate_rule_json` returned,
+            whose dates are already parsed.
         """
-        validate_rule_json(values)
+        if validate:
+            values = validate_rule_json(values)
         self.policy = values["policy"]
         self.enabled = values["enabled"]
         self.environment = values["environment"]
@@ -154,11 +192,11 @@ class RuleBase(models.Model):
         self.status_code = values.get("status_code")
         self.content_type = values.get("content_type")
         if "capture_date" in values:
-            self.capture_date_start = parse_date(values["capture_date"]["start"])
-            self.capture_date_end = parse_date(values["capture_date"]["end"])
+            self.capture_date_start = to_datetime(values["capture_date"]["start"])
+            self.capture_date_end = to_datetime(values["capture_date"]["end"])
         if "retrieve_date" in values:
-            self.retrieve_date_start = parse_date(values["retrieve_date"]["start"])
-            self.retrieve_date_end = parse_date(values["retrieve_date"]["end"])
+            self.retrieve_date_start = to_datetime(values["retrieve_date"]["start"])
+            self.retrieve_date_end = to_datetime(values["retrieve_date"]["end"])
         if "ip_range" in values:
             self.ip_range_start = values["ip_range"]["start"]
             self.ip_range_end = values["ip_range"]["end"]
@@ -241,6 +279,32 @@ class RuleBase(models.Model):
 class Rule(RuleBase):
     """Represents a rule for exclusion, inclusion, or modification."""
 
+    # The match key of the SURT pattern (see `set_match_key`), which lets
+    # lookups use an index instead of evaluating every rule's pattern.
+    surt_prefix = models.TextField(blank=True, default="", editable=False)
+    surt_has_wildcard = models.BooleanField(default=False, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the values the rule was loaded with, which `save` records
+        # as the previous values of the rule without querying them again.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_values(self):
+        """Get the values of the rule as it was loaded from (or last saved to)
+        the database.
+
+        Returns:
+        A dict of values by field attribute name, or None if the rule wasn't
+        loaded from the database or some of its fields were deferred.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None or any(name not in loaded for name in self.value_fields()):
+            return None
+        return loaded
+
     def full_values(self):
         """Get the summary of the rule plus the private comment.
 
@@ -249,6 +313,15 @@ class Rule(RuleBase):
         """
         return self.summary(include_private=True)
 
+    def set_match_key(self):
+        """Derive `surt_prefix` and `surt_has_wildcard` from the SURT, see
+        `rules.utils.matcher.surt_match_key`. Every save does this (see
+        `set_match_key_on_save`), but bulk writes must do it themselves.
+        """
+        self.surt_prefix, self.surt_has_wildcard = surt_match_key(
+            self.surt, like_dialect()
+        )
+
     def __str__(self):
         """Get a string representation of the rule for the Django admin.
 
@@ -258,38 +331,173 @@ class Rule(RuleBase):
         return "{} ({})".format(self.get_policy_display().upper(), self.surt)
 
     def save(self, *args, **kwargs):
-        """Create a RuleChange entry on save."""
+        """Create a RuleChange entry and bump the ruleset version on save.
+
+        The change is kept as `last_change`."""
         change = RuleChange(
             change_user=kwargs.get("user", ""), change_comment=kwargs.get("comment", "")
         )
-        if self.pk is None:
-            change.change_type = "c"
-            change.surt = self.surt
-            change.policy = self.policy
-        else:
-            change.change_type = "u"
-            existing = Rule.objects.get(pk=self.pk)
-            change.populate(existing.full_values())
-        super().save(*args, **kwargs)
-        change.rule = self
-        change.save()
+        with transaction.atomic():
+            if self.pk is None:
+                change.change_type = "c"
+                change.surt = self.surt
+                change.policy = self.policy
+            else:
+                change.change_type = "u"
+                loaded = self.loaded_values()
+                if loaded is None:
+                    loaded = (
+                        Rule.objects.filter(pk=self.pk)
+                        .values(*self.value_fields())
+                        .get()
+                    )
+                change.set_values(loaded)
+            super().save(*args, **kwargs)
+            change.rule = self
+            change.version = RulesetVersion.bump()
+            change.save()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+        }
+        self.last_change = change
 
     class Meta:
         indexes = [
-            models.Index(fields=["surt"])
+            # Pages of /rules, ordered by SURT and id.
+            models.Index(fields=["surt", "id"], name="rules_rule_surt_id_idx"),
+            # The admin changelist, ordered by SURT, protocol (and id)
+            # descending.
+            models.Index(
+                fields=["surt", "protocol", "id"], name="rules_rule_surt_proto_id_idx"
+            ),
+            # Rule lookups, which only ever match enabled rules (see
+            # `rules.views.rules_query`), down to their retrieval windows.
+            # The index is partial where the database supports it.
+            models.Index(
+                fields=[
+                    "surt_prefix",
+                    "surt_has_wildcard",
+                    "collection",
+                    "partner",
+                    "retrieve_date_start",
+                    "retrieve_date_end",
+                ],
+                condition=Q(enabled=True),
+                name="rules_rule_enabled_match_idx",
+            ),
             # Any additional indices would be created here.
         ]
         ordering = ["surt"]
 
 
+@receiver(pre_save, sender=Rule)
+def set_match_key_on_save(sender, instance, **kwargs):
+    """Derive the match key of a rule whenever it is saved, including raw
+    saves such as `loaddata` makes, which bypass `Rule.save`.
+    """
+    instance.set_match_key()
+
+
+@receiver(post_delete, sender=Rule)
+def bump_ruleset_version_on_delete(sender, instance, **kwargs):
+    """Bump the ruleset version and record a deletion RuleChange whenever a
+    rule is deleted.
+
+    Deletions (including queryset deletions) run in a transaction, so the
+    bump is committed or rolled back along with the rule.
+    """
+    RuleChange(
+        rule_id=instance.id,
+        change_type="d",
+        surt=instance.surt,
+        policy=instance.policy,
+        version=RulesetVersion.bump(),
+    ).save()
+
+
+class ArchivedRule(RuleBase):
+    """Represents a rule moved out of the rules table because it has been
+    disabled or expired for long enough, see `rules.utils.archive`.
+
+    An archived rule keeps the id it had as a rule, which its RuleChange
+    history still refers to and which it gets back when it is restored.
+    """
+
+    id = models.IntegerField(primary_key=True)
+    archived_date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """Get a string representation of the archived rule for the Django
+        admin.
+
+        Returns:
+        The policy type and the SURT.
+        """
+        return "{} ({})".format(self.get_policy_display().upper(), self.surt)
+
+    class Meta:
+        ordering = ["surt"]
+
+
+class RulesetVersion(models.Model):
+    """Holds the ruleset version, a counter which is incremented in the same
+    transaction as every change to the rules table.
+
+    There is a single row, with a primary key of 1.
+    """
+
+    version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        """Get the current ruleset version.
+
+        Returns:
+        The version as an integer, which is 0 if no rule was ever changed.
+        """
+        version = cls.objects.filter(pk=1).values_list("version", flat=True).first()
+        return version or 0
+
+    @classmethod
+    def bump(cls, count=1):
+        """Increment the ruleset version.
+
+        Arguments:
+        count -- How many versions to increment it by, such as the number of
+            changes made at once.
+
+        Returns:
+        The new version.
+        """
+        from rules.utils.cache import expire_ruleset_version
+
+        if not cls.objects.filter(pk=1).update(version=F("version") + count):
+            cls.objects.create(pk=1, version=count)
+        # Make this process notice its own change without waiting for the
+        # next poll. Only once the change is committed, or another thread
+        # could poll the old version in the meantime and keep it.
+        transaction.on_commit(expire_ruleset_version)
+        return cls.current()
+
+
 class RuleChange(RuleBase):
     """Represents a change to a rule in the database."""
 
     TYPE_CHOICES = (
         ("c", "created"),
         ("u", "updated"),
+        ("d", "deleted"),
+        ("a", "archived"),
+        ("r", "restored"),
+    )
+    # Changes outlive their rule, so that deletions stay in the history.
+    rule = models.ForeignKey(
+        Rule,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="rule_change",
     )
-    rule = models.ForeignKey(Rule, on_delete=models.CASCADE, related_name="rule_change")
     change_date = models.DateTimeField(auto_now=True)
     change_user = models.TextField(
         help_text="""The name of the individual making this change.""", blank=True
@@ -298,6 +506,8 @@ class RuleChange(RuleBase):
         help_text="""A brief explanation of the change.""", blank=True
     )
     change_type = models.CharField(max_length=1, choices=TYPE_CHOICES)
+    # The ruleset version the change created, which orders the change feed.
+    version = models.BigIntegerField(null=True, blank=True, db_index=True)
 
     def change_summary(self):
         """Get a brief summary of the rule change.
@@ -307,7 +517,7 @@ class RuleChange(RuleBase):
         """
         return {
             "id": self.id,
-            "rule_id": self.rule.id,
+            "rule_id": self.rule_id,
             "date": self.change_date,
             "user": self.change_user,
             "comment": self.change_comment,
@@ -322,5 +532,5 @@ class RuleChange(RuleBase):
         """
         values = self.change_summary()
         values["rule"] = self.summary(include_private=include_private)
-        values["rule"]["id"] = self.rule.id
+        values["rule"]["id"] = self.rule_id
         return values
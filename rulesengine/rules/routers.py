@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import asyncio
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# The cookie which keeps a client reading from the primary for a while after
+# it wrote, see `sticky_primary_middleware`.
+STICKY_PRIMARY_COOKIE = "rules_primary"
+
+# Whether the current request may read from a replica.
+_replica_reads = ContextVar("rules_replica_reads", default=False)
+# A list which the router records the current request's writes in.
+_writes = ContextVar("rules_writes", default=None)
+_replica = None
+
+
+def get_replica():
+    """Get the read replica this process reads from.
+
+    The replica is chosen at random from RULES_READ_REPLICAS once per process,
+    so that the caches of a process stamped with a replica's ruleset version
+    (see `rules.utils.cache`) always hold data from that replica.
+
+    Returns:
+    A database alias, or None if there are no replicas.
+    """
+    global _replica
+    replicas = getattr(settings, "RULES_READ_REPLICAS", ())
+    if not replicas:
+        return None
+    if _replica not in replicas:
+        _replica = random.choice(replicas)
+    return _replica
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads made in the block to this process' read replica."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def record_writes():
+    """Record whether any write is made in the block.
+
+    Returns:
+    A list which is non-empty after a write.
+    """
+    writes = []
+    token = _writes.set(writes)
+    try:
+        yield writes
+    finally:
+        _writes.reset(token)
+
+
+def read_from_replica(view_func):
+    """Make a view (sync or async) read from a read replica, unless the
+    client sent the sticky primary cookie because it wrote recently.
+    """
+    if asyncio.iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def wrapped_view(request, *args, **kwargs):
+            if request.COOKIES.get(STICKY_PRIMARY_COOKIE):
+                return await view_func(request, *args, **kwargs)
+            with replica_reads():
+                return await view_func(request, *args, **kwargs)
+
+    else:
+
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if request.COOKIES.get(STICKY_PRIMARY_COOKIE):
+                return view_func(request, *args, **kwargs)
+            with replica_reads():
+                return view_func(request, *args, **kwargs)
+
+    return wrapped_view
+
+
+class ReplicaRouter(object):
+    """Routes the reads of views decorated with `read_from_replica` to a read
+    replica, and every other query to the primary (the default database).
+
+    Replicas are the database aliases in RULES_READ_REPLICAS, which are never
+    migrated, and in tests should mirror the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            return get_replica() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.append(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, "RULES_READ_REPLICAS", ()):
+            return False
+        return None
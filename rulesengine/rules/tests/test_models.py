@@ -3,11 +3,14 @@ from datetime import (
     timezone,
 )
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rules.models import (
     Rule,
     RuleChange,
+    RulesetVersion,
 )
 
 
@@ -273,6 +276,61 @@ class RuleTestCase(TestCase):
         self.assertEqual(last_change.change_type, "u")
         self.assertEqual(last_change.policy, "block")
 
+    def test_update_does_not_query_rule(self):
+        Rule(policy="block", surt="https://(org,", public_comment="old").save()
+        rule = Rule.objects.get(surt="https://(org,")
+        rule.policy = "allow"
+        with CaptureQueriesContext(connection) as queries:
+            rule.save()
+        self.assertFalse(
+            [
+                query["sql"]
+                for query in queries
+                if query["sql"].startswith("SELECT")
+                and '"{}"'.format(Rule._meta.db_table) in query["sql"]
+            ]
+        )
+        self.assertEqual(rule.last_change.policy, "block")
+        self.assertEqual(rule.last_change.public_comment, "old")
+        rule.policy = "message"
+        rule.save()
+        self.assertEqual(rule.last_change.policy, "allow")
+        # Rules which weren't loaded from the database still work.
+        Rule(id=rule.id, policy="block", surt="https://(org,").save()
+        self.assertEqual(RuleChange.objects.order_by("-version")[0].policy, "message")
+
+    def test_changes_bump_ruleset_version(self):
+        version = RulesetVersion.current()
+        rule = Rule(policy="block", surt="https://(org,")
+        rule.save()
+        self.assertEqual(RulesetVersion.current(), version + 1)
+        rule.policy = "allow"
+        rule.save()
+        self.assertEqual(RulesetVersion.current(), version + 2)
+        rule.delete()
+        self.assertEqual(RulesetVersion.current(), version + 3)
+        Rule(policy="block", surt="https://(org,").save()
+        Rule(policy="block", surt="https://(com,").save()
+        Rule.objects.all().delete()
+        self.assertEqual(RulesetVersion.current(), version + 7)
+
+    def test_delete_adds_rule_change(self):
+        rule = Rule(policy="block", surt="https://(org,")
+        rule.save()
+        rule_id = rule.id
+        rule.delete()
+        self.assertEqual(
+            list(
+                RuleChange.objects.filter(rule_id=rule_id)
+                .order_by("version")
+                .values_list("change_type", "version")
+            ),
+            [
+                ("c", RulesetVersion.current() - 1),
+                ("d", RulesetVersion.current()),
+            ],
+        )
+
     def test_str(self):
         rule = Rule(policy="block", surt="https://(org,")
         self.assertEqual(str(rule), "BLOCK PLAYBACK (https://(org,)")
@@ -0,0 +1,69 @@
+import json
+
+from django.db import router
+from django.test import (
+    RequestFactory,
+    TestCase,
+    override_settings,
+)
+
+from rules.models import Rule
+from rules.routers import (
+    STICKY_PRIMARY_COOKIE,
+    ReplicaRouter,
+    read_from_replica,
+    replica_reads,
+)
+
+
+@override_settings(RULES_READ_REPLICAS=["replica"])
+class ReplicaRouterTestCase(TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads(self):
+        self.assertEqual(self.router.db_for_read(Rule), "default")
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(Rule), "replica")
+            self.assertEqual(self.router.db_for_write(Rule), "default")
+        self.assertEqual(self.router.db_for_read(Rule), "default")
+        with override_settings(RULES_READ_REPLICAS=[]), replica_reads():
+            self.assertEqual(self.router.db_for_read(Rule), "default")
+
+    def test_migrate(self):
+        self.assertFalse(self.router.allow_migrate("replica", "rules"))
+        self.assertIsNone(self.router.allow_migrate("default", "rules"))
+
+    def test_read_from_replica(self):
+        @read_from_replica
+        def view(request):
+            return router.db_for_read(Rule)
+
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get("/rules")), "replica")
+        # Clients which wrote recently read from the primary.
+        request = factory.get("/rules")
+        request.COOKIES[STICKY_PRIMARY_COOKIE] = "1"
+        self.assertEqual(view(request), "default")
+
+    def test_sticky_primary(self):
+        response = self.client.post(
+            "/rules",
+            content_type="application/json",
+            data=json.dumps(
+                {
+                    "surt": "https://(org,archive,",
+                    "policy": "block",
+                    "environment": "prod",
+                    "enabled": True,
+                }
+            ),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.cookies[STICKY_PRIMARY_COOKIE]["max-age"],
+            10,
+        )
+        response = self.client.get("/rules/changes")
+        self.assertNotIn(STICKY_PRIMARY_COOKIE, response.cookies)
@@ -3,15 +3,32 @@ from datetime import (
     timedelta,
     timezone,
 )
+import gzip
 import json
+import tempfile
+from unittest import mock
+from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
 from django.test import (
+    AsyncClient,
     Client,
     TestCase,
+    override_settings,
 )
 
 from rules.models import (
     Rule,
+    RulesetVersion,
+)
+from rules.utils.matcher import (
+    like_dialect,
+    like_escape_sql,
+)
+from rules.utils.ruleset import CompiledRuleset
+from rules.views import (
+    rules_query,
+    rules_query_batch,
 )
 
 
@@ -50,7 +67,7 @@ class ViewsTestCase(TestCase):
     def test_rules_get_surt_exact(self):
         response = self.client.get("/rules", {"surt-exact": "https://(org,archive,"})
         self.assertEqual(response.status_code, 200)
-        parsed = json.loads(response.content.decode("utf-8"))
+        parsed = json.loads(b"".join(response.streaming_content))
         self.assertEqual(parsed["status"], "success")
         self.assertEqual(parsed["message"], "ok")
         self.assertEqual(len(parsed["result"]), 1)
@@ -58,7 +75,7 @@ class ViewsTestCase(TestCase):
     def test_rules_get_surt_starts_with(self):
         response = self.client.get("/rules", {"surt-start": "https://(org,archive,"})
         self.assertEqual(response.status_code, 200)
-        parsed = json.loads(response.content.decode("utf-8"))
+        parsed = json.loads(b"".join(response.streaming_content))
         self.assertEqual(parsed["status"], "success")
         self.assertEqual(parsed["message"], "ok")
         for result in parsed["result"]:
@@ -67,11 +84,260 @@ class ViewsTestCase(TestCase):
     def test_rules_get_all(self):
         response = self.client.get("/rules")
         self.assertEqual(response.status_code, 200)
-        parsed = json.loads(response.content.decode("utf-8"))
+        parsed = json.loads(b"".join(response.streaming_content))
         self.assertEqual(parsed["status"], "success")
         self.assertEqual(parsed["message"], "ok")
         self.assertEqual(len(parsed["result"]), Rule.objects.count())
 
+    def test_rules_get_filters(self):
+        Rule(surt="https://(org,archive,", policy="allow", partner="Holst").save()
+        Rule(surt="https://(org,example,", policy="allow").save()
+        response = self.client.get("/rules", {"policy": "allow", "partner": "Holst"})
+        parsed = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            [(rule["surt"], rule["policy"]) for rule in parsed["result"]],
+            [("https://(org,archive,", "allow")],
+        )
+
+    def test_rules_get_pages(self):
+        for surt in ("https://(org,b,", "https://(org,archive,", "https://(org,a,"):
+            Rule(surt=surt, policy="block").save()
+        expected = list(
+            Rule.objects.filter(policy="block")
+            .order_by("surt", "id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(len(expected), 4)
+        url = "/rules?policy=block&limit=3"
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            parsed = json.loads(response.content.decode("utf-8"))
+            pages.append([rule["id"] for rule in parsed["result"]])
+            url = response.get("Link", "<>")[1:].split(">")[0]
+        self.assertEqual(pages, [expected[:3], expected[3:]])
+        response = self.client.get("/rules", {"policy": "block", "limit": "bad"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/rules", {"after": "bad-wolf"})
+        self.assertEqual(response.status_code, 400)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["message"], "after query string param must be a cursor")
+
+    def test_rules_get_ndjson(self):
+        Rule(surt="https://(org,example,", policy="allow").save()
+        response = self.client.get("/rules", {"format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(
+            [json.loads(line)["surt"] for line in lines],
+            ["https://(org,archive,", "https://(org,example,"],
+        )
+        response = self.client.get("/rules", {"format": "ndjson", "limit": 1})
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn("after=", response["Link"])
+
+    def test_rules_get_etag(self):
+        response = self.client.get("/rules", {"surt-start": "https://(org,"})
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.client.get(
+            "/rules", {"surt-start": "https://(org,"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        response = self.client.get(
+            "/rules", {"surt-start": "https://(com,"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        Rule(surt="https://(org,example,", policy="block").save()
+        response = self.client.get(
+            "/rules", {"surt-start": "https://(org,"}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_rules_gzip(self):
+        for i in range(10):
+            Rule(surt="https://(org,example{},".format(i), policy="block").save()
+        response = self.client.get("/rules", {"surt-start": "https://(org,"})
+        etag = response["ETag"]
+        response = self.client.get(
+            "/rules", {"surt-start": "https://(org,"}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], "W/" + etag)
+        parsed = json.loads(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(len(parsed["result"]), 11)
+        response = self.client.get(
+            "/rules",
+            {"surt-start": "https://(org,"},
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_rules_for_request_etag(self):
+        for use_matcher in (True, False):
+            with self.subTest(use_matcher=use_matcher), override_settings(
+                RULES_USE_SURT_MATCHER=use_matcher
+            ), mock.patch(
+                "rules.utils.ruleset.CompiledRuleset", wraps=CompiledRuleset
+            ) as compiled:
+                self.check_rules_for_request_etag()
+                # Without the matcher, the ETag doesn't compile the ruleset.
+                self.assertEqual(compiled.called, use_matcher)
+
+    def check_rules_for_request_etag(self):
+        params = {"surt": "https://(org,archive,", "collection": "Planets"}
+        response = self.client.get("/rules/for-request", params)
+        etag = response["ETag"]
+        # The order of the query string parameters doesn't matter.
+        response = self.client.get(
+            "/rules/for-request?collection=Planets&surt=https://(org,archive,",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 304)
+        # The ETag changes when a retrieval window closes.
+        later = datetime.now(timezone.utc) + timedelta(days=366)
+        with mock.patch("rules.utils.etags.datetime") as mock_datetime:
+            mock_datetime.now.return_value = later
+            response = self.client.get(
+                "/rules/for-request", params, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 200)
+        # And with the ruleset version.
+        Rule(surt="https://(org,example,", policy="block").save()
+        response = self.client.get(
+            "/rules/for-request", params, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_rules_for_request(self):
+        # Django 3.2's AsyncClient takes the query string from the path and
+        # extra headers by their HTTP names.
+        client = AsyncClient()
+        path = "/rules/for-request?" + urlencode(
+            {"surt": "https://(org,archive,", "collection": "Planets"}
+        )
+        response = await client.get(path)
+        self.assertEqual(response.status_code, 200)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(
+            [rule["surt"] for rule in parsed["result"]], ["https://(org,archive,"]
+        )
+        # The async and sync views agree on ETags.
+        etag = response["ETag"]
+        self.assertEqual((await sync_to_async(self.client.get)(path))["ETag"], etag)
+        response = await client.get(path, **{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        response = await client.get("/rules/tree/https://(org,archive,")
+        self.assertEqual(response.status_code, 200)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(len(parsed["result"]), 1)
+        response = await client.get("/rules/for-request?collection=Planets")
+        self.assertEqual(response.status_code, 400)
+        # Batch lookups are served by the sync view.
+        response = await client.post(
+            "/rules/for-request",
+            content_type="application/json",
+            data=json.dumps([{"surt": "https://(org,archive,"}]),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_rules_bulk(self):
+        operations = [
+            {
+                "op": "create",
+                "rule": {
+                    "surt": "https://(org,example,",
+                    "policy": "block",
+                    "environment": "prod",
+                    "enabled": True,
+                },
+            },
+            {"op": "delete", "id": self.rule.id},
+            {"op": "rename", "id": self.rule.id},
+        ]
+        response = self.client.post(
+            "/rules/bulk",
+            content_type="application/json",
+            data=json.dumps({"operations": operations, "atomic": True}),
+        )
+        self.assertEqual(response.status_code, 400)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["message"], "bulk operations failed")
+        self.assertEqual([r["index"] for r in parsed["result"]["results"]], [2])
+        self.assertEqual(Rule.objects.count(), 1)
+        response = self.client.post(
+            "/rules/bulk",
+            content_type="application/json",
+            data=json.dumps({"operations": operations}),
+        )
+        self.assertEqual(response.status_code, 200)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(
+            [r["status"] for r in parsed["result"]["results"]],
+            ["ok", "ok", "error"],
+        )
+        self.assertEqual(
+            list(Rule.objects.values_list("surt", flat=True)),
+            ["https://(org,example,"],
+        )
+        response = self.client.post(
+            "/rules/bulk", content_type="application/json", data=json.dumps([])
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rules_changes(self):
+        since = RulesetVersion.current()
+        rule = Rule(surt="https://(org,example,", policy="block")
+        rule.save()
+        rule.policy = "allow"
+        rule.save()
+        deleted_id = self.rule.id
+        self.rule.delete()
+        url = "/rules/changes?since={}&limit=2".format(since)
+        changes = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            changes.extend(json.loads(response.content.decode("utf-8"))["result"])
+            url = response.get("Link", "<>")[1:].split(">")[0]
+        self.assertEqual(
+            [
+                (change["version"], change["type"], change["rule_id"])
+                for change in changes
+            ],
+            [
+                (since + 1, "created", rule.id),
+                (since + 2, "updated", rule.id),
+                (since + 3, "deleted", deleted_id),
+            ],
+        )
+        self.assertEqual(changes[1]["rule"]["policy"], "allow")
+        self.assertNotIn("rule", changes[2])
+        response = self.client.get("/rules/changes", {"since": "bad-wolf"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rules_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(RULES_SNAPSHOT_DIR=directory):
+                response = self.client.get("/rules/snapshot")
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["Content-Type"], "application/gzip")
+                lines = gzip.decompress(b"".join(response.streaming_content))
+                header, rule = [json.loads(line) for line in lines.splitlines()]
+                self.assertEqual(
+                    header["ruleset_version"], int(response["X-Ruleset-Version"])
+                )
+                self.assertEqual(rule["id"], self.rule.id)
+                response = self.client.get(
+                    "/rules/snapshot", HTTP_IF_NONE_MATCH=response["ETag"]
+                )
+                self.assertEqual(response.status_code, 304)
+
     def test_rules_new_success(self):
         response = self.client.post(
             "/rules",
@@ -175,6 +441,20 @@ class ViewsTestCase(TestCase):
         self.assertEqual(parsed["message"], "ok")
         self.assertEqual(len(parsed["result"]) >= 1, True)
 
+    def test_rules_for_request_timestamp(self):
+        for days, count in ((10, 1), (-730, 0)):
+            capture_date = datetime.now(timezone.utc) + timedelta(days=days)
+            response = self.client.get(
+                "/rules/for-request",
+                {
+                    "surt": "https://(org,archive,",
+                    "capture-date": capture_date.strftime("%Y%m%d%H%M%S"),
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+            parsed = json.loads(response.content.decode("utf-8"))
+            self.assertEqual(len(parsed["result"]), count)
+
     def test_rules_for_request_missing_params(self):
         response = self.client.get(
             "/rules/for-request",
@@ -201,3 +481,159 @@ class ViewsTestCase(TestCase):
         self.assertEqual(
             parsed["message"], "capture-date query string param must be " "a datetime"
         )
+
+    def test_rules_for_request_batch(self):
+        Rule(surt="https://(org,archive,)/%", policy="allow").save()
+        Rule(surt="https://(org,arch_ve,)/%", policy="allow").save()
+        lookups = [
+            {"surt": "https://(org,archive,", "collection": "Planets"},
+            {"surt": "https://(org,archive,)/page"},
+            {"surt": "https://(com,example,)/"},
+            {
+                "surt": "https://(org,archive,",
+                "capture-date": "1999-01-01T00:00:00Z",
+            },
+        ]
+        for use_matcher in (False, True):
+            with override_settings(
+                RULES_USE_SURT_MATCHER=use_matcher, RULES_BATCH_CHUNK_SIZE=3
+            ):
+                response = self.client.post(
+                    "/rules/for-request",
+                    content_type="application/json",
+                    data=json.dumps(lookups),
+                )
+                self.assertEqual(response.status_code, 200)
+                parsed = json.loads(b"".join(response.streaming_content))
+                self.assertEqual(parsed["status"], "success")
+                self.assertEqual(
+                    [[rule["surt"] for rule in rules] for rules in parsed["result"]],
+                    [
+                        ["https://(org,archive,"],
+                        ["https://(org,arch_ve,)/%", "https://(org,archive,)/%"],
+                        [],
+                        [],
+                    ],
+                )
+
+    def test_rules_for_request_batch_missing_surt(self):
+        response = self.client.post(
+            "/rules/for-request",
+            content_type="application/json",
+            data=json.dumps([{"surt": "https://(org,"}, {"collection": "Planets"}]),
+        )
+        self.assertEqual(response.status_code, 400)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["message"], "surt is required")
+        self.assertEqual(parsed["result"], {"index": 1})
+
+    def test_rules_decide(self):
+        Rule(surt="https://(org,archive,)/%", policy="allow").save()
+        Rule(
+            surt="https://(org,archive,)/%",
+            policy="rewrite-js",
+            rewrite_from="zeus",
+            rewrite_to="jupiter",
+        ).save()
+        response = self.client.get(
+            "/rules/decide",
+            {
+                "surt": "https://(org,archive,)/page",
+                "client-ip": "127.0.0.1",
+                "status-code": "200",
+                "content-type": "text/html",
+                "warc-name": "jupiter-1.warc.gz",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["result"]["policy"], "allow")
+        self.assertEqual(len(parsed["result"]["rewrites"]), 1)
+        self.assertEqual(parsed["result"]["rewrites"][0]["rewrite_to"], "jupiter")
+        params = {
+            "surt": "https://(org,archive,",
+            "collection": "Planets",
+            "partner": "Holst",
+            "warc-name": "jupiter-1.warc.gz",
+            "capture-date": (
+                datetime.now(timezone.utc) + timedelta(seconds=1)
+            ).isoformat(),
+        }
+        response = self.client.get("/rules/decide", params)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["result"]["policy"], "block")
+        self.assertEqual(parsed["result"]["rule_id"], self.rule.id)
+        self.assertEqual(parsed["result"]["public_comment"], "initial creation")
+        # Without a capture date, the rule scoped to captures doesn't apply.
+        del params["capture-date"]
+        response = self.client.get("/rules/decide", params)
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["result"]["policy"], "allow")
+
+    def test_rules_decide_bad_params(self):
+        for params, message in (
+            ({}, "surt query string param is required"),
+            (
+                {"surt": "https://(org,", "client-ip": "bad wolf"},
+                "client-ip query string param must be an ip address",
+            ),
+            (
+                {"surt": "https://(org,", "status-code": "bad wolf"},
+                "status-code query string param must be an integer",
+            ),
+            (
+                {"surt": "https://(org,", "retrieve-date": "bad wolf"},
+                "retrieve-date query string param must be a datetime",
+            ),
+        ):
+            response = self.client.get("/rules/decide", params)
+            self.assertEqual(response.status_code, 400)
+            parsed = json.loads(response.content.decode("utf-8"))
+            self.assertEqual(parsed["message"], message)
+
+    def test_rules_warc_match(self):
+        other = Rule(surt="https://(org,example,)/%", policy="block", warc_match="^j")
+        other.save()
+        response = self.client.get("/rules/warc-match", {"warc-name": "jupiter-1"})
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["result"], [self.rule.id, other.id])
+        response = self.client.get(
+            "/rules/warc-match",
+            {"warc-name": "jupiter-1", "surt": "https://(org,example,)/"},
+        )
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["result"], [other.id])
+        response = self.client.get(
+            "/rules/warc-match", {"warc-name": "a-jupiter", "rule-id": other.id}
+        )
+        parsed = json.loads(response.content.decode("utf-8"))
+        self.assertEqual(parsed["result"], [])
+        response = self.client.get("/rules/warc-match")
+        self.assertEqual(response.status_code, 400)
+
+
+class FixtureLookupTestCase(TestCase):
+    # Fixtures are loaded with raw saves, which bypass `Rule.save`.
+    fixtures = ["fuzzed-small.json"]
+
+    def test_sql_lookups(self):
+        where = "%s LIKE surt{}".format(like_escape_sql(like_dialect()))
+        surts = sorted(set(Rule.objects.values_list("surt", flat=True)))
+        matched = 0
+        batch = rules_query_batch(
+            [{"surt": surt, "capture-date": None} for surt in surts]
+        )
+        for surt, batch_rules in zip(surts, batch):
+            expected = set(
+                Rule.objects.filter(enabled=True)
+                .extra(where=[where], params=[surt])
+                .values_list("id", flat=True)
+            )
+            found = rules_query(surt, include_retrieval_dates=False)
+            self.assertEqual(set(rule.id for rule in found), expected)
+            self.assertEqual(
+                set(rule.id for rule in batch_rules),
+                set(rule.id for rule in rules_query(surt)),
+            )
+            matched += len(expected)
+        self.assertGreater(matched, 0)
@@ -0,0 +1,178 @@
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    OuterRef,
+    Q,
+    Subquery,
+)
+
+from rules.utils.bulk import delete_rows
+
+
+def archivable_rules(disabled_days=None, expired_days=None, now=None):
+    """Get the rules which are due to be archived: rules which have been
+    disabled (and left unchanged) for a number of days, and rules whose
+    retrieval window closed a number of days ago.
+
+    Arguments:
+    disabled_days -- For how many days a disabled rule must have been left
+        unchanged, or None to keep disabled rules.
+    expired_days -- For how many days a rule's retrieval window must have
+        been closed, or None to keep expired rules.
+    now -- The current date, by default now.
+
+    Returns:
+    A queryset of Rule objects.
+    """
+    from rules.models import (
+        Rule,
+        RuleChange,
+    )
+
+    now = now or datetime.now(timezone.utc)
+    rules = Rule.objects.all()
+    due = Q(pk__in=[])
+    if disabled_days is not None:
+        last_change = (
+            RuleChange.objects.filter(rule_id=OuterRef("pk"))
+            .order_by("-change_date")
+            .values("change_date")[:1]
+        )
+        rules = rules.annotate(last_change_date=Subquery(last_change))
+        cutoff = now - timedelta(days=disabled_days)
+        # Rules with no recorded change predate the change history.
+        due |= Q(enabled=False) & (
+            Q(last_change_date__lt=cutoff) | Q(last_change_date__isnull=True)
+        )
+    if expired_days is not None:
+        due |= Q(retrieve_date_end__lt=now - timedelta(days=expired_days))
+    return rules.filter(due)
+
+
+def _values(obj):
+    return {name: getattr(obj, name) for name in obj.value_fields()}
+
+
+def _record(changes, change_type, user, comment, chunk_size):
+    """Record a RuleChange of the given type for each (id, values) pair, with
+    a ruleset version each."""
+    from rules.models import (
+        RuleChange,
+        RulesetVersion,
+    )
+
+    version = RulesetVersion.bump(len(changes)) - len(changes)
+    records = []
+    for rule_id, values in changes:
+        version += 1
+        change = RuleChange(
+            rule_id=rule_id,
+            change_type=change_type,
+            change_user=user,
+            change_comment=comment,
+            version=version,
+        )
+        change.set_values(values)
+        records.append(change)
+    RuleChange.objects.bulk_create(records, batch_size=chunk_size)
+
+
+def archive_rules(rules, user="", comment="", chunk_size=None):
+    """Move rules to the archive table, so lookups and the compiled ruleset
+    no longer have to skip them.
+
+    Each rule keeps its id and its RuleChange history, and an "archived"
+    change is recorded for it. The ruleset version is bumped once for all of
+    them (by one version per rule), as by a bulk request.
+
+    Arguments:
+    rules -- A queryset of Rule objects, such as `archivable_rules` returns.
+    user -- The user recorded in each RuleChange.
+    comment -- The comment recorded in each RuleChange.
+    chunk_size -- How many rows to write per query.
+
+    Returns:
+    A list of the ids of the archived rules.
+    """
+    from rules.models import (
+        ArchivedRule,
+        Rule,
+    )
+
+    if chunk_size is None:
+        chunk_size = getattr(settings, "RULES_BULK_CHUNK_SIZE", 1000)
+    with transaction.atomic():
+        # Lock the rules, so none is changed between being copied and
+        # deleted.
+        rules = list(rules.select_for_update())
+        if not rules:
+            return []
+        ids = [rule.id for rule in rules]
+        ArchivedRule.objects.bulk_create(
+            [ArchivedRule(id=rule.id, **_values(rule)) for rule in rules],
+            batch_size=chunk_size,
+        )
+        delete_rows(Rule, ids, chunk_size)
+        _record(
+            [(rule.id, _values(rule)) for rule in rules],
+            "a",
+            user,
+            comment,
+            chunk_size,
+        )
+    return ids
+
+
+def restore_rules(ids, user="", comment="", chunk_size=None):
+    """Move archived rules back to the rules table, with their original ids,
+    and record a "restored" change for each.
+
+    Arguments:
+    ids -- The ids of the archived rules to restore.
+    user -- The user recorded in each RuleChange.
+    comment -- The comment recorded in each RuleChange.
+    chunk_size -- How many rows to write per query.
+
+    Returns:
+    A list of the ids of the restored rules, leaving out the ids of rules
+    which aren't archived.
+    """
+    from rules.models import (
+        ArchivedRule,
+        Rule,
+    )
+
+    if chunk_size is None:
+        chunk_size = getattr(settings, "RULES_BULK_CHUNK_SIZE", 1000)
+    with transaction.atomic():
+        archived = []
+        for start in range(0, len(ids), chunk_size):
+            end = start + chunk_size
+            archived.extend(
+                ArchivedRule.objects.select_for_update().filter(id__in=ids[start:end])
+            )
+        if not archived:
+            return []
+        rules = []
+        for archived_rule in archived:
+            rule = Rule(id=archived_rule.id)
+            rule.set_values(_values(archived_rule))
+            rule.set_match_key()
+            rules.append(rule)
+        Rule.objects.bulk_create(rules, batch_size=chunk_size)
+        restored = [rule.id for rule in rules]
+        delete_rows(ArchivedRule, restored, chunk_size)
+        _record(
+            [(rule.id, _values(rule)) for rule in rules],
+            "r",
+            user,
+            comment,
+            chunk_size,
+        )
+    return restored
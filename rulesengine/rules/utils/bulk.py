@@ -0,0 +1,192 @@
+from django.conf import settings
+from django.db import (
+    connection,
+    transaction,
+)
+
+from rules.utils.validators import validate_rules_json
+
+# The operations a bulk request can be made of.
+OPERATIONS = ("create", "update", "delete")
+
+
+def _check(operation):
+    """Check the structure of a single bulk operation, but not its rule
+    values.
+
+    Returns:
+    An error message, or None if the operation is well formed.
+    """
+    if not isinstance(operation, dict):
+        return "operation must be an object"
+    if operation.get("op") not in OPERATIONS:
+        return "op must be one of {}".format(", ".join(OPERATIONS))
+    if operation["op"] != "create" and (
+        not isinstance(operation.get("id"), int) or isinstance(operation["id"], bool)
+    ):
+        return "id must be an integer"
+    return None
+
+
+def delete_rows(model, ids, chunk_size):
+    """Delete rows by primary key with raw, chunked queries.
+
+    Unlike a queryset delete, this doesn't send the post_delete signal, which
+    for rules would record a deletion RuleChange and bump the ruleset version
+    for every rule.
+
+    Arguments:
+    model -- The model to delete rows of.
+    ids -- The primary keys of the rows.
+    chunk_size -- How many rows to delete per query.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), chunk_size):
+            end = start + chunk_size
+            chunk = ids[start:end]
+            cursor.execute(
+                "DELETE FROM {} WHERE {} IN ({})".format(
+                    table,
+                    connection.ops.quote_name(model._meta.pk.column),
+                    ", ".join(["%s"] * len(chunk)),
+                ),
+                chunk,
+            )
+
+
+def apply_operations(operations, atomic=False, user="", comment="", chunk_size=None):
+    """Create, update and delete many rules in a single transaction.
+
+    Every operation is validated first. Then, in one transaction, the rules
+    to update or delete are read and locked, so an operation on a rule
+    deleted in the meantime fails instead of silently doing nothing. Rules
+    are written with chunked bulk queries, their RuleChange entries are
+    created in bulk, and the ruleset version is bumped once for the whole
+    batch (by one version per change, so each change has its own version in
+    the change feed).
+
+    Arguments:
+    operations -- A list of dicts with an `op` (create, update or delete),
+        the `id` of the rule to update or delete and the `rule` values to
+        create or update it with.
+    atomic -- If True, make no change at all if any operation is invalid.
+    user -- The user recorded in each RuleChange.
+    comment -- The comment recorded in each RuleChange.
+    chunk_size -- How many rows to write per query.
+
+    Returns:
+    A list of result dicts, one per operation, with the `index` of the
+    operation, a `status` of "ok" (and the rule `id`) or "error" (and an
+    error `message`). When an atomic batch has errors, the valid operations
+    have no `status`.
+    """
+    from rules.models import (
+        Rule,
+        RuleChange,
+        RulesetVersion,
+    )
+
+    if chunk_size is None:
+        chunk_size = getattr(settings, "RULES_BULK_CHUNK_SIZE", 1000)
+    results = [{"index": i} for i in range(len(operations))]
+    for result, operation in zip(results, operations):
+        message = _check(operation)
+        if message is not None:
+            result.update(status="error", message=message)
+    # Validate every rule's values at once, keeping the normalized values.
+    values = {}
+    pending = [
+        i
+        for i, (result, operation) in enumerate(zip(results, operations))
+        if "status" not in result and operation["op"] != "delete"
+    ]
+    validated = validate_rules_json([operations[i].get("rule") for i in pending])
+    for i, (rule_values, e) in zip(pending, validated):
+        if e is None:
+            values[i] = rule_values
+        else:
+            results[i].update(
+                status="error", message="error validating json: {}".format(e)
+            )
+    ids = [
+        operation["id"]
+        for result, operation in zip(results, operations)
+        if "status" not in result and operation["op"] != "create"
+    ]
+    with transaction.atomic():
+        # Lock the rules to update or delete, so none is deleted or changed
+        # between being read and written.
+        existing = {}
+        for start in range(0, len(ids), chunk_size):
+            end = start + chunk_size
+            existing.update(Rule.objects.select_for_update().in_bulk(ids[start:end]))
+        seen = set()
+        for result, operation in zip(results, operations):
+            if "status" in result or operation["op"] == "create":
+                continue
+            if operation["id"] not in existing:
+                result.update(status="error", message="rule not found")
+            elif operation["id"] in seen:
+                result.update(status="error", message="rule is changed more than once")
+            seen.add(operation["id"])
+        if atomic and any("status" in result for result in results):
+            return results
+
+        created = []
+        updated = []
+        deleted = []
+        changes = []
+        for i, (result, operation) in enumerate(zip(results, operations)):
+            if "status" in result:
+                continue
+            change = RuleChange(change_user=user, change_comment=comment)
+            if operation["op"] == "create":
+                rule = Rule()
+                rule.populate(values[i], validate=False)
+                change.change_type = "c"
+                change.surt = rule.surt
+                change.policy = rule.policy
+                created.append(rule)
+            elif operation["op"] == "update":
+                rule = existing[operation["id"]]
+                change.change_type = "u"
+                change.set_values(rule.loaded_values())
+                rule.populate(values[i], validate=False)
+                updated.append(rule)
+            else:
+                rule = existing[operation["id"]]
+                change.change_type = "d"
+                change.surt = rule.surt
+                change.policy = rule.policy
+                change.rule_id = rule.id
+                deleted.append(rule.id)
+            changes.append((result, rule, change))
+        if not changes:
+            return results
+
+        fields = [
+            field.name for field in Rule._meta.concrete_fields if not field.primary_key
+        ]
+        for rule in created + updated:
+            rule.set_match_key()
+        if connection.features.can_return_rows_from_bulk_insert:
+            Rule.objects.bulk_create(created, batch_size=chunk_size)
+        else:
+            # Without the new primary keys the changes can't refer to their
+            # rules, so insert rules one at a time (bypassing `Rule.save`).
+            for rule in created:
+                super(Rule, rule).save()
+        Rule.objects.bulk_update(updated, fields, batch_size=chunk_size)
+        delete_rows(Rule, deleted, chunk_size)
+        version = RulesetVersion.bump(len(changes)) - len(changes)
+        for result, rule, change in changes:
+            version += 1
+            if change.change_type != "d":
+                change.rule = rule
+            change.version = version
+            result.update(status="ok", id=rule.id)
+        RuleChange.objects.bulk_create(
+            [change for result, rule, change in changes], batch_size=chunk_size
+        )
+    return results
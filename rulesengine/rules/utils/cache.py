@@ -0,0 +1,124 @@
+from functools import wraps
+import threading
+import time
+
+from django.conf import settings
+from django.db import (
+    connections,
+    router,
+)
+
+# Guards the version bookkeeping only; values are built under the lock of
+# their own cache.
+_lock = threading.RLock()
+# The last ruleset version read from each database (the primary and the read
+# replica, see `rules.routers`), and when, by database alias.
+_states = {}
+
+
+def read_alias():
+    """Get the alias of the database rules are currently read from."""
+    from rules.models import RulesetVersion
+
+    return router.db_for_read(RulesetVersion)
+
+
+def get_ruleset_version():
+    """Get the ruleset version, polling the database at most once every
+    RULES_VERSION_POLL_INTERVAL seconds.
+
+    The version is that of the database rules are currently read from, so a
+    read replica's version is never ahead of the rules read from it.
+
+    Returns:
+    The ruleset version as an integer.
+    """
+    from rules.models import RulesetVersion
+
+    alias = read_alias()
+    if connections[alias].in_atomic_block:
+        # Inside a transaction the version may be one that is later rolled
+        # back (and reused), so don't remember it.
+        return RulesetVersion.current()
+    interval = getattr(settings, "RULES_VERSION_POLL_INTERVAL", 1.0)
+    now = time.monotonic()
+    with _lock:
+        state = _states.setdefault(alias, {"version": None, "checked_at": 0.0})
+        if state["version"] is None or now - state["checked_at"] >= interval:
+            state["version"] = RulesetVersion.current()
+            state["checked_at"] = now
+        return state["version"]
+
+
+def peek_ruleset_version():
+    """Get the ruleset version if it was polled recently enough not to need
+    polling again, without querying the database (or waiting for a lock), so
+    it is safe to call from async code.
+
+    Returns:
+    The ruleset version as an integer, or None.
+    """
+    interval = getattr(settings, "RULES_VERSION_POLL_INTERVAL", 1.0)
+    state = _states.get(read_alias())
+    if state is None:
+        return None
+    version, checked_at = state["version"], state["checked_at"]
+    if version is None or time.monotonic() - checked_at >= interval:
+        return None
+    return version
+
+
+def expire_ruleset_version():
+    """Force the next `get_ruleset_version` call to poll the database."""
+    with _lock:
+        for state in _states.values():
+            state["version"] = None
+
+
+def versioned_cache(func):
+    """Decorator caching the result of a function with no arguments until the
+    ruleset version changes.
+
+    Results are cached separately for each database rules are read from.
+    Like `functools.lru_cache`, the decorated function has a `cache_clear`
+    method to drop the cached results immediately. Its `fetch` method returns
+    the ruleset version along with the result, and its `peek` method does so
+    only if that needs no database query, or returns None.
+    """
+    # The (version, value) pair last computed by database alias, replaced as
+    # a whole so that `peek` can read it without the lock.
+    cache = {}
+    # Only callers of this cache wait while it is rebuilt.
+    build_lock = threading.Lock()
+
+    def fetch():
+        alias = read_alias()
+        if connections[alias].in_atomic_block:
+            # Don't cache anything built from uncommitted data.
+            return get_ruleset_version(), func()
+        version = get_ruleset_version()
+        entry = cache.get(alias)
+        if entry is not None and entry[0] == version:
+            return entry
+        with build_lock:
+            # Another thread may have built it while this one waited.
+            entry = cache.get(alias)
+            if entry is None or entry[0] != version:
+                entry = cache[alias] = (version, func())
+            return entry
+
+    def peek():
+        version = peek_ruleset_version()
+        entry = cache.get(read_alias())
+        if version is None or entry is None or entry[0] != version:
+            return None
+        return entry
+
+    @wraps(func)
+    def wrapper():
+        return fetch()[1]
+
+    wrapper.fetch = fetch
+    wrapper.peek = peek
+    wrapper.cache_clear = cache.clear
+    return wrapper
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import gzip
+import threading
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Bodies shorter than this aren't worth compressing.
+MIN_LENGTH = 200
+
+# The MIME types of the responses compressed: those of the API. Pages such
+# as the admin's aren't, since compressing a page holding a secret (like a
+# CSRF token) next to reflected input exposes it to BREACH.
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+)
+
+# Compressed bodies by ETag, content coding and uncompressed length, least
+# recently used first.
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _gzip(data):
+    return gzip.compress(data, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=5)
+
+
+def _zstd(data):
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def _codecs():
+    codecs = OrderedDict()
+    if zstandard is not None:
+        codecs["zstd"] = _zstd
+    if brotli is not None:
+        codecs["br"] = _brotli
+    codecs["gzip"] = _gzip
+    return codecs
+
+
+# The available content codings and their compression functions, most
+# preferred first.
+CODECS = _codecs()
+
+
+def negotiate(accept_encoding, codings=None):
+    """Choose the content coding of a response.
+
+    Arguments:
+    accept_encoding -- The Accept-Encoding header of the request.
+    codings -- The content codings to choose from, most preferred first, by
+        default every available one.
+
+    Returns:
+    The accepted coding with the highest quality value (the most preferred
+    one of those with the same value), or None if no coding is accepted.
+    """
+    if codings is None:
+        codings = list(CODECS)
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    best = None
+    for coding in codings:
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (coding, quality)
+    return best and best[0]
+
+
+def compress(data, coding, etag=None):
+    """Compress a response body, reusing the compressed body of an earlier
+    response with the same ETag.
+
+    Arguments:
+    data -- The bytes to compress.
+    coding -- A content coding from CODECS.
+    etag -- The ETag of the response, if it has one.
+
+    Returns:
+    The compressed bytes.
+    """
+    if etag is None:
+        return CODECS[coding](data)
+    key = (etag, coding, len(data))
+    with _lock:
+        compressed = _cache.get(key)
+        if compressed is not None:
+            _cache.move_to_end(key)
+            return compressed
+    compressed = CODECS[coding](data)
+    size = getattr(settings, "RULES_COMPRESSION_CACHE_SIZE", 256)
+    with _lock:
+        _cache[key] = compressed
+        while len(_cache) > size:
+            _cache.popitem(last=False)
+    return compressed
+
+
+def compression_cache_clear():
+    """Drop every cached compressed body."""
+    with _lock:
+        _cache.clear()
+
+
+def compress_response(request, response):
+    """Compress a JSON or NDJSON response with the best content coding the
+    client accepts.
+
+    Like `django.middleware.gzip.GZipMiddleware`, but streaming responses
+    are only compressed with gzip, and the compressed bodies of responses
+    with an ETag (which identifies a versioned body) are cached, so they are
+    compressed once rather than for every client.
+
+    Returns:
+    The response, compressed or not.
+    """
+    mime_type = response.get("Content-Type", "").split(";", 1)[0].strip().lower()
+    if mime_type not in COMPRESSIBLE_TYPES:
+        return response
+    if response.has_header("Content-Encoding") or response.status_code != 200:
+        return response
+    if not response.streaming and len(response.content) < MIN_LENGTH:
+        return response
+    patch_vary_headers(response, ("Accept-Encoding",))
+    accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+    if response.streaming:
+        coding = negotiate(accept_encoding, ["gzip"])
+        if coding is None:
+            return response
+        response.streaming_content = compress_sequence(response.streaming_content)
+        del response["Content-Length"]
+    else:
+        coding = negotiate(accept_encoding)
+        if coding is None:
+            return response
+        etag = response.get("ETag")
+        compressed = compress(response.content, coding, etag)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+    # The compressed body is a different representation with the same ETag.
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = "W/" + etag
+    response["Content-Encoding"] = coding
+    return response
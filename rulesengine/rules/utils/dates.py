@@ -0,0 +1,59 @@
+from datetime import (
+    datetime,
+    timezone,
+)
+import re
+
+from dateutil.parser import parse as dateutil_parse
+
+# A Wayback Machine timestamp, YYYYMMDDhhmmss in UTC.
+_TIMESTAMP_RE = re.compile(r"^(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})$")
+
+# The start of an extended format ISO 8601 date.
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def parse_timestamp(value):
+    """Parse a 14-digit Wayback Machine timestamp.
+
+    Returns:
+    An aware datetime in UTC, or None if the value isn't a 14-digit
+    timestamp.
+
+    Raises:
+    ValueError if the value has 14 digits but isn't a valid date.
+    """
+    match = _TIMESTAMP_RE.match(value)
+    if match is None:
+        return None
+    return datetime(*map(int, match.groups()), tzinfo=timezone.utc)
+
+
+def parse_date(value):
+    """Parse a date, trying fast, strict parsers for the formats clients
+    usually send before falling back to dateutil.
+
+    14-digit Wayback Machine timestamps are parsed as UTC, and ISO 8601 dates
+    (with a trailing Z for UTC) with `datetime.fromisoformat`. Anything else
+    is parsed by `dateutil.parser.parse`.
+
+    Arguments:
+    value -- The date string.
+
+    Returns:
+    A datetime, which is naive if the value has no time zone.
+
+    Raises:
+    ValueError if the value isn't a valid date.
+    """
+    if len(value) == 14:
+        parsed = parse_timestamp(value)
+        if parsed is not None:
+            return parsed
+    if _ISO_DATE_RE.match(value):
+        iso = value[:-1] + "+00:00" if value.endswith("Z") else value
+        try:
+            return datetime.fromisoformat(iso)
+        except ValueError:
+            pass
+    return dateutil_parse(value)
@@ -0,0 +1,97 @@
+from datetime import (
+    datetime,
+    timezone,
+)
+from hashlib import sha1
+
+from django.conf import settings
+
+from rules.utils.cache import (
+    get_ruleset_version,
+    versioned_cache,
+)
+from rules.utils.intervals import IntervalIndex
+from rules.utils.ruleset import get_ruleset
+
+
+def _request_etag(request, version):
+    query = sorted(
+        (key, value) for key, values in request.GET.lists() for value in values
+    )
+    digest = sha1(repr((request.path, query)).encode("utf-8")).hexdigest()
+    return "{}-{}".format(version, digest)
+
+
+def rules_etag(request, *args, **kwargs):
+    """Compute the ETag of a response which only depends on the ruleset and
+    the request, for use with `django.views.decorators.http.etag`.
+
+    The ETag is derived from the ruleset version and the normalized path and
+    query string, so it is computed without querying the rules.
+
+    Returns:
+    An ETag string, or None for requests which aren't GET or HEAD.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    return _request_etag(request, get_ruleset_version())
+
+
+@versioned_cache
+def get_retrieve_index():
+    """Return an IntervalIndex of the retrieval windows of the enabled rules,
+    which is all lookup ETags need when the ruleset isn't compiled.
+    """
+    from rules.models import Rule
+
+    return IntervalIndex(
+        Rule.objects.filter(enabled=True)
+        .exclude(retrieve_date_start=None, retrieve_date_end=None)
+        .values_list("id", "retrieve_date_start", "retrieve_date_end")
+        .iterator(),
+        closed=False,
+    )
+
+
+def lookup_etag(request, version, retrieve_index):
+    """Compute the ETag of a rule lookup response, which also changes
+    whenever the retrieval window of an enabled rule opens or closes.
+
+    Arguments:
+    request -- The lookup request.
+    version -- The ruleset version.
+    retrieve_index -- The IntervalIndex of the retrieval windows of that
+        version, such as `CompiledRuleset.retrieve_index`.
+
+    Returns:
+    An ETag string.
+    """
+    now = datetime.now(timezone.utc)
+    return "{}-{}".format(_request_etag(request, version), retrieve_index.region(now))
+
+
+def rules_lookup_etag(request, *args, **kwargs):
+    """Compute the ETag of a rule lookup response (see `lookup_etag`), for
+    use with `django.views.decorators.http.etag`.
+
+    The retrieval windows are taken from the compiled ruleset with
+    RULES_USE_SURT_MATCHER, and otherwise read on their own rather than
+    compiling the ruleset just for the ETag.
+
+    Returns:
+    An ETag string, or None for requests which aren't GET or HEAD.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    if getattr(settings, "RULES_USE_SURT_MATCHER", False):
+        version, ruleset = get_ruleset.fetch()
+        return lookup_etag(request, version, ruleset.retrieve_index)
+    version, retrieve_index = get_retrieve_index.fetch()
+    return lookup_etag(request, version, retrieve_index)
+
+
+def snapshot_etag(request, *args, **kwargs):
+    """Compute the ETag of a ruleset snapshot, which only depends on the
+    ruleset version.
+    """
+    return "snapshot-{}".format(get_ruleset_version())
@@ -0,0 +1,97 @@
+from bisect import bisect_left
+from functools import lru_cache
+
+
+class IntervalIndex(object):
+    """Finds the intervals containing a value in O(log n) time.
+
+    The interval endpoints split the line into elementary regions (the
+    endpoints themselves and the gaps between them), and each interval is
+    stored in the O(log n) nodes of a segment tree over those regions which
+    cover it. A query walks from the region of the value to the root of the
+    tree, and the result for each region is cached.
+    """
+
+    def __init__(self, intervals=(), closed=True, cache_size=1024):
+        """Build the index.
+
+        Arguments:
+        intervals -- An iterable of (id, start, end) triples, where start or
+            end may be None for intervals which are unbounded on that side.
+        closed -- Whether intervals contain their endpoints.
+        cache_size -- How many regions' results to keep.
+        """
+        self.closed = closed
+        self.cache_size = cache_size
+        self.intervals = []
+        self._tree = None
+        for interval_id, start, end in intervals:
+            self.add(interval_id, start, end)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self, interval_id, start, end):
+        """Add an interval to the index."""
+        self.intervals.append((interval_id, start, end))
+        self._tree = None
+
+    def region(self, value):
+        """Get the index of the elementary region a value falls in.
+
+        Values in the same region are contained in the same intervals.
+        """
+        if self._tree is None:
+            self._build()
+        i = bisect_left(self._points, value)
+        if i < len(self._points) and self._points[i] == value:
+            return 2 * i + 1
+        return 2 * i
+
+    def _build(self):
+        points = set()
+        for interval_id, start, end in self.intervals:
+            points.update(point for point in (start, end) if point is not None)
+        self._points = sorted(points)
+        regions = 2 * len(self._points) + 1
+        size = 1
+        while size < regions:
+            size *= 2
+        self._size = size
+        self._tree = [[] for i in range(2 * size)]
+        for interval_id, start, end in self.intervals:
+            first = 0 if start is None else self.region(start)
+            last = regions - 1 if end is None else self.region(end)
+            if not self.closed:
+                first += start is not None
+                last -= end is not None
+            # Store the interval in the canonical nodes covering the regions.
+            first += size
+            last += size + 1
+            while first < last:
+                if first & 1:
+                    self._tree[first].append(interval_id)
+                    first += 1
+                if last & 1:
+                    last -= 1
+                    self._tree[last].append(interval_id)
+                first //= 2
+                last //= 2
+        self._stab_region = lru_cache(maxsize=self.cache_size)(self._collect)
+
+    def _collect(self, region):
+        ids = []
+        node = region + self._size
+        while node:
+            ids.extend(self._tree[node])
+            node //= 2
+        return frozenset(ids)
+
+    def stab(self, value):
+        """Find the intervals containing a value.
+
+        Returns:
+        A frozenset of interval ids.
+        """
+        region = self.region(value)
+        return self._stab_region(region)
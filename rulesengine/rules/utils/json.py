@@ -1,15 +1,91 @@
-from datetime import datetime
+from datetime import (
+    datetime,
+    timezone,
+)
+from functools import lru_cache
 import json
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import (
+    HttpResponse,
+    StreamingHttpResponse,
+)
+
+from rules.utils.cache import versioned_cache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 
 def date_renderer(obj):
+    """Render a datetime in UTC, treating naive datetimes as UTC."""
     if isinstance(obj, datetime):
+        if obj.tzinfo is not None:
+            obj = obj.astimezone(timezone.utc)
         return obj.replace(tzinfo=None).isoformat() + "Z"
     return obj
 
 
+def _json_dumps(obj):
+    return json.dumps(obj, default=date_renderer).encode("utf-8")
+
+
+def _orjson_dumps(obj):
+    # orjson would render aware datetimes with their offset rather than in
+    # UTC, so leave them to `date_renderer`.
+    return orjson.dumps(
+        obj,
+        default=date_renderer,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+# The encoders RULES_JSON_ENCODER can name, by name.
+ENCODERS = {
+    "json": _json_dumps,
+    "orjson": _orjson_dumps,
+}
+
+
+def get_encoder():
+    """Get the JSON encoder named by RULES_JSON_ENCODER.
+
+    The default `json` encoder is the standard library's. The `orjson`
+    encoder is much faster, but its output is compact and not ASCII-only, so
+    it is equivalent JSON (which decodes to the same values) rather than the
+    same bytes.
+
+    Returns:
+    A function of an object returning its JSON encoding as bytes.
+
+    Raises:
+    ImproperlyConfigured if the encoder is unknown or isn't installed.
+    """
+    name = getattr(settings, "RULES_JSON_ENCODER", "json")
+    if name not in ENCODERS:
+        raise ImproperlyConfigured(
+            "RULES_JSON_ENCODER must be one of {}".format(", ".join(ENCODERS))
+        )
+    if name == "orjson" and orjson is None:
+        raise ImproperlyConfigured(
+            "RULES_JSON_ENCODER is orjson, which isn't installed"
+        )
+    return ENCODERS[name]
+
+
+def dumps(obj):
+    """Encode an object as JSON with the encoder RULES_JSON_ENCODER names,
+    rendering datetimes with `date_renderer`.
+
+    Returns:
+    The JSON encoded bytes.
+    """
+    return get_encoder()(obj)
+
+
 def success(obj):
     """Create an HttpResponse object with a JSON payload indicating success.
 
@@ -20,18 +96,142 @@ def success(obj):
     A Django HttpResponse including the JSON with the proper MIME type.
     """
     return HttpResponse(
-        json.dumps(
+        dumps(
             {
                 "status": "success",
                 "message": "ok",
                 "result": obj,
-            },
-            default=date_renderer,
+            }
         ),
         content_type="application/json",
     )
 
 
+@lru_cache(maxsize=None)
+def _list_envelope(encode):
+    """Split an encoder's encoding of a successful response whose result is
+    a list around the list items, so that lists of already encoded items
+    can be joined into the same bytes the encoder would give.
+
+    Returns:
+    A (start, separator, end) triple of bytes.
+    """
+    start, separator, end = encode(
+        {"status": "success", "message": "ok", "result": [0, 0]}
+    ).split(b"0")
+    return start, separator, end
+
+
+def success_encoded(items):
+    """Create an HttpResponse object with a JSON payload indicating success,
+    whose result is a list of already serialized items.
+
+    Arguments:
+    items -- An iterable of JSON encoded bytes, such as `encode_summaries`
+        gives.
+
+    Returns:
+    A Django HttpResponse with the same body `success` would give for a list
+    of the decoded items.
+    """
+    start, separator, end = _list_envelope(get_encoder())
+    return HttpResponse(
+        start + separator.join(items) + end,
+        content_type="application/json",
+    )
+
+
+def success_stream(items):
+    """Create a StreamingHttpResponse object with a JSON payload indicating
+    success, whose result is a list that is serialized one item at a time.
+
+    Arguments:
+    items -- An iterable of objects to be serialized in the result list.
+        Items which are bytes are taken to be serialized already.
+
+    Returns:
+    A Django StreamingHttpResponse with the same body `success` would give
+    for a list of the items.
+    """
+
+    encode = get_encoder()
+    start, separator, end = _list_envelope(encode)
+
+    def body():
+        yield start
+        first = True
+        for item in items:
+            if not isinstance(item, bytes):
+                item = encode(item)
+            yield item if first else separator + item
+            first = False
+        yield end
+
+    return StreamingHttpResponse(body(), content_type="application/json")
+
+
+def ndjson_stream(items):
+    """Create a StreamingHttpResponse object with a newline delimited JSON
+    payload, which is serialized one item at a time.
+
+    Arguments:
+    items -- An iterable of objects to be serialized, one per line.
+
+    Returns:
+    A Django StreamingHttpResponse with the NDJSON MIME type.
+    """
+
+    encode = get_encoder()
+
+    def body():
+        for item in items:
+            yield encode(item) + b"\n"
+
+    return StreamingHttpResponse(body(), content_type="application/x-ndjson")
+
+
+def encode_list(encoded):
+    """Join JSON encoded bytes into the encoding of a list of them."""
+    return b"[" + _list_envelope(get_encoder())[1].join(encoded) + b"]"
+
+
+@versioned_cache
+def get_summary_cache():
+    """Return the dict of encoded rule summaries by rule id for the current
+    ruleset version, which the lookup views share. Since it is kept until
+    the version changes, it should only hold the enabled rules lookups
+    return.
+    """
+    return {}
+
+
+def encode_summaries(rules, cache=None):
+    """Get the JSON encoding of the public summary of each of a list of
+    rules, encoding each rule only once per ruleset version.
+
+    Arguments:
+    rules -- An iterable of Rule objects. A QuerySet is only evaluated after
+        the ruleset version is read, so its rules are never older than the
+        version they are cached under.
+    cache -- A dict of encodings by rule id to use instead of the one for
+        the current ruleset version.
+
+    Returns:
+    A list of JSON encoded bytes.
+    """
+    if cache is None:
+        cache = get_summary_cache()
+    encode = get_encoder()
+    encoded = []
+    for rule in rules:
+        data = cache.get(rule.id)
+        if data is None:
+            data = encode(rule.summary())
+            cache[rule.id] = data
+        encoded.append(data)
+    return encoded
+
+
 def error(message, obj):
     """Create an HttpResponse object with an optional payload indicating
     failure.
@@ -50,7 +250,7 @@ def error(message, obj):
     if obj is not None:
         result["result"] = obj
     return HttpResponse(
-        json.dumps(result, default=date_renderer),
+        dumps(result),
         content_type="application/json",
         status=400,
     )
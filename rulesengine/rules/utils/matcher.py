@@ -0,0 +1,290 @@
+from collections import namedtuple
+import re
+
+from django.db import connections
+
+from rules.utils.cache import read_alias
+
+# SURTs are split into tokens at the same places `rules.utils.surt.Surt`
+# splits them into parts (after the protocol's `(` and each domain comma, and
+# before `)`, `/`, `?` and `#`), except that no characters are dropped, so
+# joining the tokens always gives back the original string. Every token but
+# the last one in a string is also a token of any string it is a prefix of.
+_TOKEN_RE = re.compile(r"[)/?#]?[^(,)/?#]*[(,]?")
+
+# How SURT rules are matched, from fastest to slowest.
+EXACT = "exact"
+PREFIX = "prefix"
+WILDCARD = "wildcard"
+KINDS = (EXACT, PREFIX, WILDCARD)
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+class LikeDialect(namedtuple("LikeDialect", ["case_insensitive", "escape"])):
+    """How a database evaluates LIKE patterns.
+
+    Attributes:
+    case_insensitive -- Whether ASCII letters match regardless of case.
+    escape -- The character which makes the following character literal, or
+        None.
+    """
+
+
+SQLITE_LIKE = LikeDialect(case_insensitive=True, escape=None)
+POSTGRES_LIKE = LikeDialect(case_insensitive=False, escape="\\")
+
+
+def like_dialect(using=None):
+    """Return the LikeDialect of a database.
+
+    Arguments:
+    using -- The alias of the database, by default the one rules are
+        currently read from.
+    """
+    connection = connections[using or read_alias()]
+    if connection.settings_dict.get("RULES_SERVING"):
+        from rules.utils.serving import serving_dialect
+
+        return serving_dialect(connection)
+    if connection.vendor == "sqlite":
+        return SQLITE_LIKE
+    return POSTGRES_LIKE
+
+
+def like_escape_sql(dialect):
+    """Get the ESCAPE clause which makes a `LIKE` use the escape character of
+    a dialect, which SQLite (unlike PostgreSQL) doesn't have by default.
+
+    Returns:
+    An SQL string, empty if the dialect has no escape character.
+    """
+    if dialect.escape is None:
+        return ""
+    return " ESCAPE '{}'".format(dialect.escape.replace("'", "''"))
+
+
+def _parse_like(pattern, dialect):
+    """Split a LIKE pattern into literal strings and `%`/`_` wildcards.
+
+    Returns:
+    A list of (is_wildcard, text) pairs.
+    """
+    parts = []
+    literal = []
+    chars = iter(pattern)
+    for char in chars:
+        if char == dialect.escape:
+            # A trailing escape character is taken literally.
+            literal.append(next(chars, char))
+        elif char in "%_":
+            if literal:
+                parts.append((False, "".join(literal)))
+                literal = []
+            parts.append((True, char))
+        else:
+            literal.append(char)
+    if literal:
+        parts.append((False, "".join(literal)))
+    return parts
+
+
+def classify_surt(surt, dialect=POSTGRES_LIKE):
+    """Classify a rule SURT by how it can be matched.
+
+    Arguments:
+    surt -- A rule SURT, which is an SQL LIKE pattern.
+    dialect -- The LikeDialect the pattern is evaluated with.
+
+    Returns:
+    A (kind, literal) pair: EXACT for SURTs with no wildcards, which match
+    `literal` only; PREFIX for SURTs whose only wildcard is a trailing `%`,
+    which match anything starting with `literal`; and WILDCARD for anything
+    else, in which case `literal` is None.
+    """
+    parts = _parse_like(surt, dialect)
+    if parts[-1:] == [(True, "%")]:
+        kind = PREFIX
+        parts = parts[:-1]
+    else:
+        kind = EXACT
+    if any(is_wildcard for is_wildcard, text in parts):
+        return WILDCARD, None
+    return kind, "".join(text for is_wildcard, text in parts)
+
+
+def like_to_regex(pattern, dialect=POSTGRES_LIKE):
+    """Compile a LIKE pattern to an equivalent regular expression.
+
+    Arguments:
+    pattern -- An SQL LIKE pattern.
+    dialect -- The LikeDialect the pattern is evaluated with.
+
+    Returns:
+    A compiled regular expression, to be used with `fullmatch`.
+    """
+    regex = "".join(
+        (".*" if text == "%" else ".") if is_wildcard else re.escape(text)
+        for is_wildcard, text in _parse_like(pattern, dialect)
+    )
+    flags = re.DOTALL
+    if dialect.case_insensitive:
+        flags |= re.IGNORECASE | re.ASCII
+    return re.compile(regex, flags)
+
+
+def fold_surt(surt, dialect=POSTGRES_LIKE):
+    """Fold the case of a SURT if the dialect's LIKE ignores case."""
+    if dialect.case_insensitive:
+        return surt.translate(_ASCII_LOWER)
+    return surt
+
+
+def surt_match_key(surt, dialect=POSTGRES_LIKE):
+    """Derive the indexed match key of a rule SURT, which `rules_query` finds
+    rules by without evaluating every rule's LIKE pattern.
+
+    Arguments:
+    surt -- A rule SURT, which is an SQL LIKE pattern.
+    dialect -- The LikeDialect the pattern is evaluated with.
+
+    Returns:
+    A (prefix, has_wildcard) pair. The prefix of a SURT without wildcards is
+    the (case folded) SURT itself; for the others it is the longest part of
+    the literal text before the first wildcard which ends at a token
+    boundary, and so is one of the `surt_match_prefixes` of every SURT the
+    pattern matches.
+    """
+    parts = _parse_like(surt, dialect)
+    literal = []
+    for is_wildcard, text in parts:
+        if is_wildcard:
+            break
+        literal.append(text)
+    literal = fold_surt("".join(literal), dialect)
+    if not any(is_wildcard for is_wildcard, text in parts):
+        return literal, False
+    tokens = surt_tokens(literal)
+    # The last token is only complete if nothing can be appended to it.
+    if tokens and not tokens[-1].endswith(("(", ",")):
+        tokens.pop()
+    return "".join(tokens), True
+
+
+def surt_match_prefixes(surt, dialect=POSTGRES_LIKE):
+    """Get the candidate match keys (see `surt_match_key`) of the rules which
+    may match a SURT: the (case folded) SURT ending at each of its token
+    boundaries, from the empty string to the whole SURT.
+
+    Returns:
+    A list of strings, shortest first.
+    """
+    prefixes = [""]
+    for token in surt_tokens(fold_surt(surt, dialect)):
+        prefixes.append(prefixes[-1] + token)
+    return prefixes
+
+
+def surt_tokens(surt):
+    """Split a SURT into its parts without losing any characters.
+
+    Arguments:
+    surt -- A SURT (or partial SURT).
+
+    Returns:
+    A list of non-empty strings which join back into `surt`.
+    """
+    return [token for token in _TOKEN_RE.findall(surt) if token]
+
+
+class _Node(object):
+    """A node in the SURT part trie."""
+
+    __slots__ = ("children", "prefixes")
+
+    def __init__(self):
+        self.children = {}
+        # (remainder, rule id) for rules whose SURT starts with the path to
+        # this node followed by `remainder`.
+        self.prefixes = []
+
+
+class SurtMatcher(object):
+    """An in-memory equivalent of `WHERE <surt> LIKE rules_rule.surt`.
+
+    Rule SURTs are classified with `classify_surt`. Exact SURTs are looked up
+    in a dict, and prefix SURTs in a trie keyed on SURT parts, so that both
+    cost time proportional to the length of the SURT being looked up rather
+    than to the number of rules. The remaining wildcard SURTs are compiled to
+    regular expressions which are all tried in turn.
+    """
+
+    def __init__(self, rules=(), dialect=POSTGRES_LIKE):
+        """Build the matcher.
+
+        Arguments:
+        rules -- An iterable of (rule id, rule SURT) pairs.
+        dialect -- The LikeDialect to reproduce.
+        """
+        self.dialect = dialect
+        self.exact = {}
+        self.root = _Node()
+        self.wildcards = []
+        self.counts = dict.fromkeys(KINDS, 0)
+        for rule_id, surt in rules:
+            self.add(rule_id, surt)
+
+    def add(self, rule_id, surt):
+        """Add a single rule to the matcher.
+
+        Returns:
+        The kind of the rule's SURT.
+        """
+        kind, literal = classify_surt(surt, self.dialect)
+        self.counts[kind] += 1
+        if kind == WILDCARD:
+            self.wildcards.append((like_to_regex(surt, self.dialect), rule_id))
+        elif kind == EXACT:
+            self.exact.setdefault(fold_surt(literal, self.dialect), []).append(rule_id)
+        else:
+            tokens = surt_tokens(fold_surt(literal, self.dialect))
+            remainder = tokens.pop() if tokens else ""
+            node = self.root
+            for token in tokens:
+                node = node.children.setdefault(token, _Node())
+            node.prefixes.append((remainder, rule_id))
+        return kind
+
+    def match(self, surt):
+        """Find the rules whose SURT pattern matches a SURT.
+
+        Arguments:
+        surt -- The SURT to look up.
+
+        Returns:
+        A set of matching rule ids.
+        """
+        folded = fold_surt(surt, self.dialect)
+        matches = set(self.exact.get(folded, ()))
+        node = self.root
+        offset = 0
+        for token in surt_tokens(folded) + [None]:
+            for remainder, rule_id in node.prefixes:
+                if folded.startswith(remainder, offset):
+                    matches.add(rule_id)
+            node = node.children.get(token)
+            if node is None:
+                break
+            offset += len(token)
+        for regex, rule_id in self.wildcards:
+            if regex.fullmatch(surt):
+                matches.add(rule_id)
+        return matches
+
+    def stats(self):
+        """Count the rules of each kind.
+
+        Returns:
+        A dict of rule counts keyed by EXACT, PREFIX and WILDCARD.
+        """
+        return dict(self.counts)
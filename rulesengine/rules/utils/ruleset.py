@@ -0,0 +1,345 @@
+from datetime import (
+    datetime,
+    timezone,
+)
+
+from django.utils.timezone import (
+    is_naive,
+    make_aware,
+)
+import ipaddr
+
+from rules.utils.cache import versioned_cache
+from rules.utils.intervals import IntervalIndex
+from rules.utils.matcher import (
+    EXACT,
+    POSTGRES_LIKE,
+    SurtMatcher,
+    classify_surt,
+    like_dialect,
+    like_to_regex,
+)
+from rules.utils.warc import WarcMatcher
+
+# Policies which decide whether a playback may happen, as opposed to the
+# rewrite policies, which modify a playback and may all apply at once.
+ACCESS_POLICIES = ("block", "message", "allow", "auth")
+
+# The policy for requests to which no access rule applies.
+DEFAULT_POLICY = "allow"
+
+
+def aware(date):
+    """Treat naive datetimes as UTC, as the database does."""
+    if date is not None and is_naive(date):
+        return make_aware(date, timezone.utc)
+    return date
+
+
+def mime_type(content_type):
+    """Get the lowercased MIME type of a Content-Type, without parameters."""
+    return content_type.split(";", 1)[0].strip().lower()
+
+
+class CompiledRuleset(object):
+    """An in-memory copy of the enabled rules, with each rule's conditions
+    compiled once so requests can be evaluated without the database.
+    """
+
+    def __init__(self, rules=(), dialect=POSTGRES_LIKE):
+        """Compile the ruleset.
+
+        Arguments:
+        rules -- An iterable of enabled Rule objects.
+        dialect -- The LikeDialect SURT patterns are evaluated with.
+        """
+        self.dialect = dialect
+        self.rules = {}
+        self.matcher = SurtMatcher(dialect=dialect)
+        self.neg_surts = {}
+        self.warc_matcher = WarcMatcher()
+        self.warc_rules = set()
+        self.ip_rules = set()
+        self.ip_indexes = {4: IntervalIndex(), 6: IntervalIndex()}
+        self.content_types = {}
+        # Capture and retrieval windows exclude their endpoints, as they do in
+        # `rules.views.rules_query`.
+        self.capture_rules = set()
+        self.capture_index = IntervalIndex(closed=False)
+        self.retrieve_rules = set()
+        self.retrieve_index = IntervalIndex(closed=False)
+        self.specificity = {}
+        # Encoded rule summaries, see `rules.utils.json.encode_summaries`.
+        self.summaries = {}
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule):
+        """Compile a single rule into the ruleset."""
+        self.rules[rule.id] = rule
+        kind = self.matcher.add(rule.id, rule.surt)
+        literal = classify_surt(rule.surt, self.dialect)[1]
+        # Longer literal SURTs are more specific; exact SURTs beat prefixes of
+        # the same length and wildcard patterns come last.
+        self.specificity[rule.id] = (
+            len(literal) if literal is not None else -1,
+            kind == EXACT,
+        )
+        if rule.neg_surt:
+            self.neg_surts[rule.id] = like_to_regex(rule.neg_surt, self.dialect)
+        if rule.warc_match:
+            # A rule whose WARC pattern can't be compiled never matches.
+            self.warc_rules.add(rule.id)
+            self.warc_matcher.add(rule.id, rule.warc_match)
+        if rule.content_type:
+            self.content_types[rule.id] = mime_type(rule.content_type)
+        if rule.capture_date_start or rule.capture_date_end:
+            self.capture_rules.add(rule.id)
+            self.capture_index.add(
+                rule.id, rule.capture_date_start, rule.capture_date_end
+            )
+        if rule.retrieve_date_start or rule.retrieve_date_end:
+            self.retrieve_rules.add(rule.id)
+            self.retrieve_index.add(
+                rule.id, rule.retrieve_date_start, rule.retrieve_date_end
+            )
+        if rule.ip_range_start and rule.ip_range_end:
+            self.ip_rules.add(rule.id)
+            start = ipaddr.IPAddress(rule.ip_range_start)
+            end = ipaddr.IPAddress(rule.ip_range_end)
+            # A range mixing IPv4 and IPv6 addresses contains nothing.
+            if start.version == end.version:
+                self.ip_indexes[start.version].add(rule.id, int(start), int(end))
+
+    def candidates(self, surt):
+        """Get the rules whose SURT pattern matches a SURT.
+
+        Returns:
+        A list of Rule objects.
+        """
+        return [self.rules[rule_id] for rule_id in self.matcher.match(surt)]
+
+    def active(self, rule_ids, retrieve_date, capture_date=None):
+        """Narrow a set of rules down to those whose retrieval (and capture)
+        windows contain the given dates.
+
+        Arguments:
+        rule_ids -- A set of rule ids.
+        retrieve_date -- The date of retrieval.
+        capture_date -- The date of capture, or None to ignore capture
+            windows.
+
+        Returns:
+        A set of rule ids.
+        """
+        scoped = rule_ids & self.retrieve_rules
+        if scoped:
+            rule_ids = rule_ids - (scoped - self.retrieve_index.stab(retrieve_date))
+        if capture_date is not None:
+            scoped = rule_ids & self.capture_rules
+            if scoped:
+                rule_ids = rule_ids - (scoped - self.capture_index.stab(capture_date))
+        return rule_ids
+
+    def query(
+        self, surt, neg_surt=None, collection=None, partner=None, capture_date=None
+    ):
+        """The in-memory equivalent of `rules.views.rules_query`.
+
+        Arguments:
+        surt -- The SURT to match.
+        neg_surt -- Only match rules with this SURT negation.
+        collection -- Match against a partner's collection.
+        partner -- Match against a partner.
+        capture_date -- The date of the requested capture.
+
+        Returns:
+        A list of matching Rule objects, ordered by SURT.
+        """
+        rule_ids = self.active(
+            self.matcher.match(surt), datetime.now(timezone.utc), aware(capture_date)
+        )
+        rules = []
+        for rule_id in rule_ids:
+            rule = self.rules[rule_id]
+            if neg_surt is not None and rule.neg_surt != neg_surt:
+                continue
+            if collection is not None and rule.collection not in (collection, ""):
+                continue
+            if partner is not None and rule.partner not in (partner, ""):
+                continue
+            rules.append(rule)
+        rules.sort(key=lambda rule: (rule.surt, rule.id))
+        return rules
+
+    def match(self, request):
+        """Find the rules which apply to a request.
+
+        Unlike in `rules.views.rules_query`, a rule with a condition on an
+        attribute missing from the request doesn't apply, since the caller
+        can't check the condition itself: an IP-scoped allow rule must not
+        apply to every client.
+
+        Arguments:
+        request -- A Request.
+
+        Returns:
+        A list of Rule objects.
+        """
+        rule_ids = self.active(
+            self.matcher.match(request.surt),
+            request.retrieve_date,
+            request.capture_date,
+        )
+        if request.capture_date is None:
+            rule_ids -= self.capture_rules
+        if request.client_ip is None:
+            rule_ids -= self.ip_rules
+        else:
+            scoped = rule_ids & self.ip_rules
+            if scoped:
+                index = self.ip_indexes[request.client_ip.version]
+                rule_ids -= scoped - index.stab(int(request.client_ip))
+        if request.warc_name is None:
+            rule_ids -= self.warc_rules
+        else:
+            scoped = rule_ids & self.warc_rules
+            if scoped:
+                rule_ids -= scoped - self.warc_matcher.match(request.warc_name, scoped)
+        return [
+            self.rules[rule_id]
+            for rule_id in rule_ids
+            if self.applies(self.rules[rule_id], request)
+        ]
+
+    def applies(self, rule, request):
+        """Check the conditions of a rule which `match` doesn't look up in an
+        index.
+
+        Arguments:
+        rule -- A Rule object from this ruleset.
+        request -- A Request.
+
+        Returns:
+        True if every such condition of the rule is met, which a condition on
+        an attribute missing from the request never is.
+        """
+        if rule.environment != request.environment:
+            return False
+        neg_surt = self.neg_surts.get(rule.id)
+        if neg_surt is not None and neg_surt.fullmatch(request.surt):
+            return False
+        if rule.seconds_since_capture and (
+            request.capture_date is None
+            or (request.retrieve_date - request.capture_date).total_seconds()
+            > rule.seconds_since_capture
+        ):
+            return False
+        if rule.collection and rule.collection != request.collection:
+            return False
+        if rule.partner and rule.partner != request.partner:
+            return False
+        if rule.protocol and rule.protocol != request.protocol:
+            return False
+        if rule.subdomain and rule.subdomain != request.subdomain:
+            return False
+        if rule.status_code and rule.status_code != request.status_code:
+            return False
+        if (
+            rule.id in self.content_types
+            and self.content_types[rule.id] != request.content_type
+        ):
+            return False
+        return True
+
+    def decide(self, request):
+        """Evaluate every rule against a request.
+
+        The most specific access rule (the one with the longest literal SURT,
+        then the most recently created) decides the policy; every applicable
+        rewrite rule is returned, least specific first.
+
+        Arguments:
+        request -- A Request.
+
+        Returns:
+        A (rule, rewrites) pair of the winning access Rule (or None) and a
+        list of rewrite Rules.
+        """
+        winner = None
+        rewrites = []
+        for rule in self.match(request):
+            if rule.policy in ACCESS_POLICIES:
+                if winner is None or self._rank(rule) > self._rank(winner):
+                    winner = rule
+            else:
+                rewrites.append(rule)
+        rewrites.sort(key=self._rank)
+        return winner, rewrites
+
+    def _rank(self, rule):
+        return self.specificity[rule.id] + (rule.id,)
+
+
+class Request(object):
+    """The attributes of a playback request which rules are evaluated
+    against. Any attribute but `surt` may be None if it is unknown.
+    """
+
+    def __init__(
+        self,
+        surt,
+        environment="prod",
+        protocol=None,
+        subdomain=None,
+        client_ip=None,
+        status_code=None,
+        content_type=None,
+        warc_name=None,
+        capture_date=None,
+        retrieve_date=None,
+        collection=None,
+        partner=None,
+    ):
+        """Normalize the request attributes.
+
+        Arguments:
+        surt -- The SURT being played back.
+        environment -- The environment the playback happens in.
+        protocol -- The protocol of the URL, taken from the SURT by default.
+        subdomain -- The subdomain canonicalized away from the SURT.
+        client_ip -- The IP address (as a string) of the client.
+        status_code -- The HTTP status code of the capture.
+        content_type -- The Content-Type of the capture.
+        warc_name -- The name of the WARC file holding the capture.
+        capture_date -- When the capture was made.
+        retrieve_date -- When the capture is played back, by default now.
+        collection -- The collection of the capture.
+        partner -- The partner the capture belongs to.
+        """
+        self.surt = surt
+        self.environment = environment
+        if protocol is None and "://" in surt:
+            protocol = surt.split("://", 1)[0]
+        self.protocol = protocol
+        self.subdomain = subdomain
+        self.client_ip = ipaddr.IPAddress(client_ip) if client_ip else None
+        self.status_code = status_code
+        self.content_type = mime_type(content_type) if content_type else None
+        self.warc_name = warc_name
+        self.capture_date = aware(capture_date)
+        self.retrieve_date = aware(retrieve_date) or datetime.now(timezone.utc)
+        self.collection = collection
+        self.partner = partner
+
+
+@versioned_cache
+def get_ruleset():
+    """Return a CompiledRuleset of every enabled rule, rebuilt whenever the
+    ruleset version changes.
+    """
+    from rules.models import Rule
+
+    return CompiledRuleset(
+        Rule.objects.filter(enabled=True).iterator(), dialect=like_dialect()
+    )
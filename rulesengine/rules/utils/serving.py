@@ -0,0 +1,153 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connections,
+    transaction,
+)
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from rules.utils.matcher import (
+    LikeDialect,
+    like_dialect,
+)
+
+# The version of the serving database format, bumped on incompatible changes.
+SERVING_FORMAT_VERSION = 1
+
+# The alias the serving database is registered under while it is built.
+_BUILD_ALIAS = "rules_serving_build"
+
+
+class ServingDatabaseError(Exception):
+    """Raised when no consistent serving database could be built."""
+
+
+def build_serving_db(path, retries=3, chunk_size=1000):
+    """Compile every enabled rule into a read-only SQLite serving database
+    and atomically replace the file at `path` with it.
+
+    The serving database has the rules table (with the indexed SURT match
+    keys `rules_query` looks rules up by) and the ruleset version of the
+    default database, so the lookup views can read from it like from a read
+    replica (see RULES_SERVING_DB). It also records how the default
+    database evaluates LIKE patterns, which it reproduces.
+
+    The ruleset version is read before and after the rules, and the database
+    is built again if it changed in between.
+
+    Arguments:
+    path -- The path of the serving database.
+    retries -- How many times to try building a consistent database.
+    chunk_size -- How many rules to copy per query.
+
+    Returns:
+    The ruleset version of the serving database.
+
+    Raises:
+    ServingDatabaseError if the ruleset changed while each database was
+    built.
+    """
+    from rules.models import RulesetVersion
+
+    directory = os.path.dirname(os.path.abspath(path))
+    dialect = like_dialect()
+    for attempt in range(retries):
+        version = RulesetVersion.current()
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            _write_serving_db(temp_path, version, dialect, chunk_size)
+            if RulesetVersion.current() == version:
+                os.replace(temp_path, path)
+                return version
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    raise ServingDatabaseError(
+        "the ruleset changed while each of {} serving databases was built".format(
+            retries
+        )
+    )
+
+
+def _write_serving_db(path, version, dialect, chunk_size):
+    from rules.models import (
+        Rule,
+        RulesetVersion,
+    )
+
+    connections.databases[_BUILD_ALIAS] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+    }
+    connections.ensure_defaults(_BUILD_ALIAS)
+    connections.prepare_test_settings(_BUILD_ALIAS)
+    try:
+        with connections[_BUILD_ALIAS].schema_editor() as editor:
+            editor.create_model(Rule)
+            editor.create_model(RulesetVersion)
+            editor.execute(
+                "CREATE TABLE rules_serving (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+        with transaction.atomic(using=_BUILD_ALIAS):
+            with connections[_BUILD_ALIAS].cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO rules_serving (key, value) VALUES (%s, %s)",
+                    [
+                        ("format_version", str(SERVING_FORMAT_VERSION)),
+                        ("ruleset_version", str(version)),
+                        ("like_case_insensitive", str(int(dialect.case_insensitive))),
+                        ("like_escape", dialect.escape or ""),
+                    ],
+                )
+            RulesetVersion.objects.using(_BUILD_ALIAS).create(pk=1, version=version)
+            rules = []
+            for rule in (
+                Rule.objects.using(DEFAULT_DB_ALIAS)
+                .filter(enabled=True)
+                .iterator(chunk_size=chunk_size)
+            ):
+                rules.append(rule)
+                if len(rules) == chunk_size:
+                    Rule.objects.using(_BUILD_ALIAS).bulk_create(rules)
+                    rules = []
+            Rule.objects.using(_BUILD_ALIAS).bulk_create(rules)
+        with connections[_BUILD_ALIAS].cursor() as cursor:
+            cursor.execute("ANALYZE")
+    finally:
+        connections[_BUILD_ALIAS].close()
+        del connections[_BUILD_ALIAS]
+        del connections.databases[_BUILD_ALIAS]
+
+
+def serving_dialect(connection):
+    """Get the LikeDialect a serving database reproduces, that of the
+    database it was built from.
+    """
+    connection.ensure_connection()
+    return connection.rules_like_dialect
+
+
+@receiver(connection_created)
+def configure_serving_connection(sender, connection, **kwargs):
+    """Set up each connection to a serving database: memory map the file and
+    evaluate LIKE patterns as the database it was built from did.
+    """
+    if not connection.settings_dict.get("RULES_SERVING"):
+        return
+    mmap_size = getattr(settings, "RULES_SERVING_DB_MMAP_SIZE", 256 * 1024 * 1024)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA mmap_size = {:d}".format(mmap_size))
+        cursor.execute("SELECT key, value FROM rules_serving")
+        meta = dict(cursor.fetchall())
+        dialect = LikeDialect(
+            case_insensitive=meta["like_case_insensitive"] == "1",
+            escape=meta["like_escape"] or None,
+        )
+        if not dialect.case_insensitive:
+            cursor.execute("PRAGMA case_sensitive_like = ON")
+    connection.rules_like_dialect = dialect
@@ -0,0 +1,150 @@
+import fcntl
+import gzip
+import json
+import os
+import re
+import tempfile
+
+from django.conf import settings
+
+from rules.utils.cache import get_ruleset_version
+
+# The version of the snapshot file format, bumped on incompatible changes.
+SNAPSHOT_FORMAT_VERSION = 1
+
+_SNAPSHOT_NAME_RE = re.compile(r"^rules-(\d+)\.ndjson\.gz$")
+
+
+class SnapshotError(Exception):
+    """Raised when no consistent snapshot of the ruleset could be taken."""
+
+
+def snapshot_dir():
+    """Get the directory snapshots are cached in by default."""
+    return getattr(settings, "RULES_SNAPSHOT_DIR", None) or os.path.join(
+        tempfile.gettempdir(), "rulesengine-snapshots"
+    )
+
+
+def snapshot_path(version, directory):
+    """Get the path of the snapshot of a ruleset version."""
+    return os.path.join(directory, "rules-{}.ndjson.gz".format(version))
+
+
+def latest_snapshot(directory):
+    """Find the most recent snapshot in a directory.
+
+    Returns:
+    A (version, path) pair, or None if there is no snapshot.
+    """
+    versions = []
+    for name in os.listdir(directory):
+        match = _SNAPSHOT_NAME_RE.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    if not versions:
+        return None
+    version = max(versions)
+    return version, snapshot_path(version, directory)
+
+
+def get_snapshot(directory=None):
+    """Get the snapshot of the current ruleset version, building it if it
+    isn't cached on disk yet.
+
+    Only one process builds a snapshot at a time; the others wait for it and
+    then use its snapshot instead of reading the rules themselves.
+
+    The snapshot is opened before the lock is released, so it can still be
+    read once a newer snapshot has replaced it.
+
+    Arguments:
+    directory -- The directory snapshots are cached in, by default
+        RULES_SNAPSHOT_DIR.
+
+    Returns:
+    A (version, file) pair of the version and the snapshot file, opened for
+    reading in binary mode, which the caller must close.
+    """
+    directory = directory or snapshot_dir()
+    os.makedirs(directory, exist_ok=True)
+    version = get_ruleset_version()
+    try:
+        return version, open(snapshot_path(version, directory), "rb")
+    except FileNotFoundError:
+        pass
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            latest = latest_snapshot(directory)
+            if latest is None or latest[0] < version:
+                latest = build_snapshot(directory)
+            return latest[0], open(latest[1], "rb")
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def build_snapshot(directory, retries=3):
+    """Write a snapshot of every enabled rule, streamed from a database
+    cursor, and remove the snapshots of older versions.
+
+    A snapshot is a gzip compressed file of newline delimited JSON. The first
+    line is a header with the `format_version` and `ruleset_version`, and
+    each following line is the summary of an enabled rule.
+
+    The ruleset version is read before and after the rules, and the snapshot
+    is taken again if it changed in between.
+
+    Arguments:
+    directory -- The directory to write the snapshot to.
+    retries -- How many times to try taking a consistent snapshot.
+
+    Returns:
+    A (version, path) pair.
+    """
+    from rules.models import (
+        Rule,
+        RulesetVersion,
+    )
+
+    for attempt in range(retries):
+        version = RulesetVersion.current()
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+                    out.write(
+                        _encode(
+                            {
+                                "format_version": SNAPSHOT_FORMAT_VERSION,
+                                "ruleset_version": version,
+                            }
+                        )
+                    )
+                    for rule in Rule.objects.filter(enabled=True).iterator():
+                        out.write(_encode(rule.summary()))
+            if RulesetVersion.current() == version:
+                path = snapshot_path(version, directory)
+                os.replace(temp_path, path)
+                _remove_older(directory, version)
+                return version, path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    raise SnapshotError(
+        "the ruleset changed while each of {} snapshots was taken".format(retries)
+    )
+
+
+def _encode(obj):
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _remove_older(directory, version):
+    for name in os.listdir(directory):
+        match = _SNAPSHOT_NAME_RE.match(name)
+        if match and int(match.group(1)) < version:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
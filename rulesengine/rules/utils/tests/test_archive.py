@@ -0,0 +1,93 @@
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from django.test import TestCase
+
+from rules.models import (
+    ArchivedRule,
+    Rule,
+    RuleChange,
+    RulesetVersion,
+)
+from rules.utils.archive import (
+    archivable_rules,
+    archive_rules,
+    restore_rules,
+)
+
+
+class ArchiveTestCase(TestCase):
+
+    def setUp(self):
+        self.now = datetime.now(timezone.utc)
+        self.hot = Rule(surt="https://(org,archive,", policy="block")
+        self.hot.save()
+        self.disabled = Rule(surt="https://(org,example,", policy="block")
+        self.disabled.enabled = False
+        self.disabled.save()
+        self.expired = Rule(
+            surt="https://(com,example,",
+            policy="allow",
+            retrieve_date_end=self.now - timedelta(days=40),
+        )
+        self.expired.save()
+        # `change_date` is set on save, so age the history with an update.
+        RuleChange.objects.filter(rule=self.disabled).update(
+            change_date=self.now - timedelta(days=100)
+        )
+
+    def test_archivable_rules(self):
+        self.assertEqual(
+            set(archivable_rules(90, 30, self.now)), {self.disabled, self.expired}
+        )
+        self.assertEqual(list(archivable_rules(90, None, self.now)), [self.disabled])
+        self.assertEqual(list(archivable_rules(None, 30, self.now)), [self.expired])
+        self.assertEqual(list(archivable_rules(200, 60, self.now)), [])
+
+    def test_archive_and_restore(self):
+        version = RulesetVersion.current()
+        ids = archive_rules(archivable_rules(90, 30, self.now), user="Donna")
+        self.assertEqual(sorted(ids), sorted([self.disabled.id, self.expired.id]))
+        self.assertEqual(list(Rule.objects.all()), [self.hot])
+        self.assertEqual(
+            sorted(ArchivedRule.objects.values_list("id", "surt")),
+            sorted(
+                [
+                    (self.disabled.id, self.disabled.surt),
+                    (self.expired.id, self.expired.surt),
+                ]
+            ),
+        )
+        self.assertEqual(RulesetVersion.current(), version + 2)
+        # The history is kept, without deletions.
+        self.assertEqual(
+            list(
+                RuleChange.objects.filter(rule_id=self.disabled.id)
+                .order_by("version")
+                .values_list("change_type", flat=True)
+            ),
+            ["c", "a"],
+        )
+
+        self.assertEqual(restore_rules([self.disabled.id, 12345]), [self.disabled.id])
+        rule = Rule.objects.get(id=self.disabled.id)
+        self.assertEqual(rule.surt, self.disabled.surt)
+        self.assertFalse(rule.enabled)
+        self.assertEqual(rule.surt_prefix, self.disabled.surt_prefix)
+        self.assertFalse(ArchivedRule.objects.filter(id=self.disabled.id).exists())
+        self.assertEqual(RulesetVersion.current(), version + 3)
+        self.assertEqual(
+            RuleChange.objects.filter(rule_id=self.disabled.id)
+            .order_by("-version")
+            .values_list("change_type", flat=True)
+            .first(),
+            "r",
+        )
+
+    def test_archive_nothing(self):
+        version = RulesetVersion.current()
+        self.assertEqual(archive_rules(archivable_rules(200, 60, self.now)), [])
+        self.assertEqual(RulesetVersion.current(), version)
@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from rules.models import (
+    Rule,
+    RuleChange,
+    RulesetVersion,
+)
+from rules.utils.bulk import apply_operations
+
+
+class ApplyOperationsTestCase(TestCase):
+
+    def setUp(self):
+        self.rule = Rule(surt="https://(org,archive,", policy="block")
+        self.rule.save()
+
+    def values(self, surt, policy="block"):
+        return {"surt": surt, "policy": policy, "environment": "prod", "enabled": True}
+
+    def test_apply_operations(self):
+        version = RulesetVersion.current()
+        results = apply_operations(
+            [
+                {"op": "create", "rule": self.values("https://(org,example,")},
+                {"op": "create", "rule": self.values("https://(com,example,")},
+                {
+                    "op": "update",
+                    "id": self.rule.id,
+                    "rule": self.values("https://(org,archive,", "allow"),
+                },
+                {"op": "delete", "id": 12345},
+                {"op": "create", "rule": {"surt": "https://(org,"}},
+            ],
+            user="Donna",
+            chunk_size=1,
+        )
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["ok", "ok", "ok", "error", "error"],
+        )
+        self.assertEqual(results[3]["message"], "rule not found")
+        self.assertEqual(
+            sorted(Rule.objects.values_list("surt", "policy")),
+            [
+                ("https://(com,example,", "block"),
+                ("https://(org,archive,", "allow"),
+                ("https://(org,example,", "block"),
+            ],
+        )
+        self.assertEqual(RulesetVersion.current(), version + 3)
+        changes = RuleChange.objects.filter(version__gt=version).order_by("version")
+        self.assertEqual(
+            [
+                (change.change_type, change.rule_id, change.version)
+                for change in changes
+            ],
+            [
+                ("c", results[0]["id"], version + 1),
+                ("c", results[1]["id"], version + 2),
+                ("u", self.rule.id, version + 3),
+            ],
+        )
+        self.assertEqual(changes[2].policy, "block")
+        self.assertEqual(changes[2].change_user, "Donna")
+
+        results = apply_operations(
+            [
+                {"op": "delete", "id": results[0]["id"]},
+                {"op": "delete", "id": results[1]["id"]},
+                {"op": "delete", "id": results[1]["id"]},
+            ]
+        )
+        self.assertEqual(
+            [result["status"] for result in results], ["ok", "ok", "error"]
+        )
+        self.assertEqual(Rule.objects.count(), 1)
+        self.assertEqual(
+            list(
+                RuleChange.objects.filter(version__gt=version + 3).values_list(
+                    "change_type", flat=True
+                )
+            ),
+            ["d", "d"],
+        )
+
+    def test_locks_rules(self):
+        with mock.patch.object(
+            Rule.objects, "select_for_update", wraps=Rule.objects.select_for_update
+        ) as select_for_update:
+            results = apply_operations(
+                [
+                    {"op": "delete", "id": self.rule.id},
+                    {"op": "create", "rule": self.values("https://(org,example,")},
+                ]
+            )
+        select_for_update.assert_called_once_with()
+        self.assertEqual([result["status"] for result in results], ["ok", "ok"])
+
+    def test_atomic(self):
+        version = RulesetVersion.current()
+        results = apply_operations(
+            [
+                {"op": "create", "rule": self.values("https://(org,example,")},
+                {"op": "delete"},
+            ],
+            atomic=True,
+        )
+        self.assertEqual(
+            results,
+            [
+                {"index": 0},
+                {"index": 1, "status": "error", "message": "id must be an integer"},
+            ],
+        )
+        self.assertEqual(Rule.objects.count(), 1)
+        self.assertEqual(RulesetVersion.current(), version)
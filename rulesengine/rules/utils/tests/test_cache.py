@@ -0,0 +1,85 @@
+import threading
+from unittest import mock
+
+from django.db import transaction
+from django.test import (
+    TransactionTestCase,
+    override_settings,
+)
+
+from rules.models import (
+    Rule,
+    RulesetVersion,
+)
+from rules.utils.cache import (
+    expire_ruleset_version,
+    get_ruleset_version,
+    versioned_cache,
+)
+
+
+@override_settings(RULES_VERSION_POLL_INTERVAL=3600)
+class VersionedCacheTestCase(TransactionTestCase):
+
+    def setUp(self):
+        expire_ruleset_version()
+        self.calls = 0
+
+        @versioned_cache
+        def count_rules():
+            self.calls += 1
+            return Rule.objects.count()
+
+        self.count_rules = count_rules
+
+    def test_cached_until_version_changes(self):
+        self.assertEqual(self.count_rules(), 0)
+        self.assertEqual(self.count_rules(), 0)
+        self.assertEqual(self.calls, 1)
+        Rule(policy="block", surt="https://(org,").save()
+        self.assertEqual(get_ruleset_version(), RulesetVersion.current())
+        self.assertEqual(self.count_rules(), 1)
+        self.assertEqual(self.calls, 2)
+
+    def test_version_is_polled(self):
+        self.assertEqual(self.count_rules(), 0)
+        # A change made by another process is only seen after the poll
+        # interval.
+        RulesetVersion.objects.update_or_create(pk=1, defaults={"version": 42})
+        self.assertEqual(self.count_rules(), 0)
+        self.assertEqual(self.calls, 1)
+        expire_ruleset_version()
+        self.assertEqual(get_ruleset_version(), 42)
+        self.assertEqual(self.count_rules(), 0)
+        self.assertEqual(self.calls, 2)
+
+    def test_built_outside_the_version_lock(self):
+        blocked = []
+
+        @versioned_cache
+        def slow():
+            # Polling or expiring the version from another thread doesn't
+            # wait for this cache to be built.
+            thread = threading.Thread(target=expire_ruleset_version)
+            thread.start()
+            thread.join(timeout=5)
+            blocked.append(thread.is_alive())
+            return 1
+
+        self.assertEqual(slow(), 1)
+        self.assertEqual(blocked, [False])
+
+    def test_expired_on_commit(self):
+        with mock.patch("rules.utils.cache.expire_ruleset_version") as expire:
+            with transaction.atomic():
+                RulesetVersion.bump()
+                # Until the change is committed, other threads could only poll
+                # the old version again.
+                expire.assert_not_called()
+            expire.assert_called_once_with()
+
+    def test_cache_clear(self):
+        self.count_rules()
+        self.count_rules.cache_clear()
+        self.count_rules()
+        self.assertEqual(self.calls, 2)
@@ -0,0 +1,91 @@
+import gzip
+import unittest
+
+from django.http import (
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.test import RequestFactory
+
+from rules.utils.compression import (
+    CODECS,
+    compress,
+    compress_response,
+    compression_cache_clear,
+    negotiate,
+)
+
+
+class NegotiateTestCase(unittest.TestCase):
+
+    def test_negotiate(self):
+        codings = ["zstd", "br", "gzip"]
+        self.assertEqual(negotiate("gzip, deflate", codings), "gzip")
+        self.assertEqual(negotiate("gzip, br", codings), "br")
+        self.assertEqual(negotiate("gzip;q=1.0, br;q=0.5", codings), "gzip")
+        self.assertEqual(negotiate("*", codings), "zstd")
+        self.assertEqual(negotiate("*;q=0.5, br;q=0", codings), "zstd")
+        self.assertIsNone(negotiate("gzip;q=0", codings))
+        self.assertIsNone(negotiate("identity", codings))
+        self.assertIsNone(negotiate("", codings))
+        self.assertEqual(negotiate("GZIP;Q=0.1"), "gzip")
+
+    def test_available_codings(self):
+        self.assertEqual(list(CODECS)[-1], "gzip")
+        self.assertEqual(negotiate("br, zstd, gzip;q=0.5"), list(CODECS)[0])
+
+
+class CompressResponseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        compression_cache_clear()
+        self.body = b'{"status": "success", "result": [' + b"1, " * 200 + b"1]}"
+        self.request = RequestFactory().get("/rules", HTTP_ACCEPT_ENCODING="gzip")
+
+    def tearDown(self):
+        compression_cache_clear()
+
+    def test_compress_response(self):
+        response = HttpResponse(self.body, content_type="application/json")
+        response["ETag"] = '"1-abc"'
+        response = compress_response(self.request, response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], 'W/"1-abc"')
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+
+    def test_compressed_once(self):
+        compressed = compress(self.body, "gzip", '"1-abc"')
+        # The same ETag gets the cached body.
+        self.assertIs(compress(self.body, "gzip", '"1-abc"'), compressed)
+        self.assertIsNot(compress(self.body, "gzip", '"2-abc"'), compressed)
+        self.assertIsNot(compress(self.body, "gzip"), compressed)
+
+    def test_uncompressed(self):
+        response = compress_response(
+            RequestFactory().get("/rules"),
+            HttpResponse(self.body, content_type="application/json"),
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        for response in (
+            HttpResponse(b"{}", content_type="application/json"),
+            HttpResponse(self.body, content_type="application/gzip"),
+            HttpResponse(self.body, content_type="text/html; charset=utf-8"),
+            HttpResponse(self.body, content_type="application/json", status=400),
+        ):
+            response = compress_response(self.request, response)
+            self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming(self):
+        response = StreamingHttpResponse(
+            iter([self.body[:100], self.body[100:]]),
+            content_type="application/x-ndjson",
+        )
+        request = RequestFactory().get("/rules", HTTP_ACCEPT_ENCODING="br, gzip")
+        response = compress_response(request, response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), self.body
+        )
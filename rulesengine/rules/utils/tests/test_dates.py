@@ -0,0 +1,42 @@
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+import unittest
+
+from rules.utils.dates import (
+    parse_date,
+    parse_timestamp,
+)
+
+
+class ParseDateTestCase(unittest.TestCase):
+
+    def test_timestamp(self):
+        self.assertEqual(
+            parse_date("20200102030405"),
+            datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        )
+        self.assertIsNone(parse_timestamp("2020010203040"))
+        with self.assertRaises(ValueError):
+            parse_date("20201302030405")
+
+    def test_iso(self):
+        self.assertEqual(parse_date("2020-01-02"), datetime(2020, 1, 2))
+        self.assertEqual(
+            parse_date("2020-01-02T03:04:05"), datetime(2020, 1, 2, 3, 4, 5)
+        )
+        self.assertEqual(
+            parse_date("2020-01-02T03:04:05.123456Z"),
+            datetime(2020, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc),
+        )
+        self.assertEqual(
+            parse_date("2020-01-02T03:04:05-05:00"),
+            datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=-5))),
+        )
+
+    def test_fallback(self):
+        self.assertEqual(parse_date("Jan 2 2020"), datetime(2020, 1, 2))
+        with self.assertRaises(ValueError):
+            parse_date("bad-wolf")
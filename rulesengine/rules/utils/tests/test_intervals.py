@@ -0,0 +1,52 @@
+import random
+import unittest
+
+from rules.utils.intervals import IntervalIndex
+
+
+class IntervalIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1963)
+        self.intervals = []
+        for i in range(200):
+            start = random.choice([None, random.randint(0, 100)])
+            end = random.choice([None, random.randint(0, 100)])
+            if start is not None and end is not None and start > end:
+                start, end = end, start
+            self.intervals.append((i, start, end))
+
+    def brute_force(self, value, closed):
+        ids = set()
+        for i, start, end in self.intervals:
+            if closed:
+                if (start is None or start <= value) and (end is None or value <= end):
+                    ids.add(i)
+            elif (start is None or start < value) and (end is None or value < end):
+                ids.add(i)
+        return ids
+
+    def test_closed(self):
+        index = IntervalIndex(self.intervals)
+        for value in range(-1, 102):
+            self.assertEqual(index.stab(value), self.brute_force(value, True))
+
+    def test_open(self):
+        index = IntervalIndex(self.intervals, closed=False)
+        for value in range(-1, 102):
+            self.assertEqual(index.stab(value), self.brute_force(value, False))
+            self.assertEqual(
+                index.stab(value + 0.5), self.brute_force(value + 0.5, False)
+            )
+
+    def test_regions(self):
+        index = IntervalIndex([(1, 10, 20)])
+        self.assertEqual(
+            [index.region(value) for value in (5, 10, 15, 20, 25)], [0, 1, 2, 3, 4]
+        )
+
+    def test_empty(self):
+        index = IntervalIndex()
+        self.assertEqual(index.stab(1), frozenset())
+        index.add(1, None, None)
+        self.assertEqual(index.stab(1), {1})
@@ -1,8 +1,16 @@
-from datetime import datetime
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
 import unittest
 
 import json
 
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+from rules.models import Rule
 import rules.utils.json
 
 
@@ -44,6 +52,82 @@ class JSONTestCase(unittest.TestCase):
         }
         self.assertEqual(json.loads(response.content.decode()), expected)
 
+    def test_success_stream(self):
+        items = [self.obj, {"companions": []}]
+        response = rules.utils.json.success_stream(iter(items))
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            rules.utils.json.success(items).content,
+        )
+
+    def test_success_stream_encoded(self):
+        response = rules.utils.json.success_stream(
+            [b'{"companions": []}', rules.utils.json.encode_list([b"1", b"2"])]
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            rules.utils.json.success([{"companions": []}, [1, 2]]).content,
+        )
+
+    def test_success_encoded(self):
+        rule = Rule(
+            id=1,
+            policy="block",
+            surt="https://(org,archive,",
+            capture_date_start=datetime(1963, 11, 23, 17, 16, 20),
+        )
+        cache = {}
+        encoded = rules.utils.json.encode_summaries([rule], cache)
+        self.assertEqual(cache, {1: encoded[0]})
+        self.assertEqual(
+            rules.utils.json.success_encoded(encoded).content,
+            rules.utils.json.success([rule.summary()]).content,
+        )
+        # Encodings are reused for as long as the cache is.
+        rule.surt = "https://(org,example,"
+        self.assertEqual(rules.utils.json.encode_summaries([rule], cache), encoded)
+        self.assertEqual(
+            rules.utils.json.success_encoded([]).content,
+            rules.utils.json.success([]).content,
+        )
+
+    @unittest.skipIf(rules.utils.json.orjson is None, "orjson isn't installed")
+    def test_orjson_encoder(self):
+        obj = dict(
+            self.obj,
+            end_date=datetime(2005, 3, 26, 19, 0, 0, 5, tzinfo=timezone.utc),
+            regeneration_date=datetime(
+                2005, 6, 18, 20, 0, tzinfo=timezone(timedelta(hours=2))
+            ),
+            name="Ood Sigma ☃",
+        )
+        expected = rules.utils.json.success(obj).content
+        with override_settings(RULES_JSON_ENCODER="orjson"):
+            content = rules.utils.json.success(obj).content
+            # Results of encoded items are as compact as the encoder's.
+            self.assertEqual(
+                rules.utils.json.success_encoded([b"1", b"2"]).content,
+                rules.utils.json.success([1, 2]).content,
+            )
+            self.assertEqual(
+                b"".join(
+                    rules.utils.json.success_stream(
+                        [obj, rules.utils.json.encode_list([b"1", b"2"])]
+                    ).streaming_content
+                ),
+                rules.utils.json.success([obj, [1, 2]]).content,
+            )
+        self.assertNotEqual(content, expected)
+        self.assertEqual(json.loads(content), json.loads(expected))
+        self.assertEqual(
+            json.loads(content)["result"]["regeneration_date"], "2005-06-18T18:00:00Z"
+        )
+
+    def test_unknown_encoder(self):
+        with override_settings(RULES_JSON_ENCODER="pickle"):
+            with self.assertRaises(ImproperlyConfigured):
+                rules.utils.json.success(self.obj)
+
     def test_error(self):
         response = rules.utils.json.error("dalek", None)
         expected = {"status": "error", "message": "dalek"}
@@ -0,0 +1,235 @@
+import unittest
+from unittest import mock
+
+from django.test import TestCase
+
+from rules.models import Rule
+from rules.utils.matcher import (
+    EXACT,
+    POSTGRES_LIKE,
+    PREFIX,
+    SQLITE_LIKE,
+    WILDCARD,
+    SurtMatcher,
+    classify_surt,
+    like_dialect,
+    like_to_regex,
+    surt_match_key,
+    surt_match_prefixes,
+    surt_tokens,
+)
+from rules.views import rules_query
+
+
+class SurtTokensTestCase(unittest.TestCase):
+
+    def test_tokens(self):
+        self.assertEqual(
+            surt_tokens("https://(org,archive,)/some/page?q=1#top"),
+            [
+                "https:",
+                "/",
+                "/(",
+                "org,",
+                "archive,",
+                ")",
+                "/some",
+                "/page",
+                "?q=1",
+                "#top",
+            ],
+        )
+
+    def test_tokens_are_lossless(self):
+        for surt in ("", "http", "(org,", "org,archive)/a//b?c,d", "%)/_/"):
+            self.assertEqual("".join(surt_tokens(surt)), surt)
+
+
+class SurtMatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = SurtMatcher(
+            [
+                (1, "%"),
+                (2, "https://(org,archive,"),
+                (3, "https://(org,archive,%"),
+                (4, "https://(org,archive,)/some%"),
+                (5, "https://(org,archive,)/so%"),
+                (6, "https://(org,%,)/%"),
+                (7, "http://(org,archive,%"),
+                (8, "https://(org,archive,)/some/page"),
+            ]
+        )
+
+    def test_exact(self):
+        self.assertEqual(
+            self.matcher.match("https://(org,archive,"),
+            {1, 2, 3},
+        )
+
+    def test_prefix(self):
+        self.assertEqual(
+            self.matcher.match("https://(org,archive,)/some/page"),
+            {1, 3, 4, 5, 6, 8},
+        )
+        self.assertEqual(
+            self.matcher.match("https://(org,archive,)/something"),
+            {1, 3, 4, 5, 6},
+        )
+        self.assertEqual(self.matcher.match("ftp://(org,"), {1})
+
+    def test_wildcard(self):
+        self.assertEqual(self.matcher.match("https://(org,example,)/"), {1, 6})
+        self.assertEqual(self.matcher.match("https://(org,example,"), {1})
+
+    def test_stats(self):
+        self.assertEqual(self.matcher.stats(), {EXACT: 2, PREFIX: 5, WILDCARD: 1})
+
+    def test_case_sensitive(self):
+        self.assertEqual(self.matcher.match("HTTPS://(ORG,ARCHIVE,"), {1})
+
+    def test_case_insensitive(self):
+        matcher = SurtMatcher(
+            [
+                (1, "https://(org,Archive,%"),
+                (2, "https://(org,Archive,"),
+                (3, "https://(org,_rchive,%"),
+            ],
+            dialect=SQLITE_LIKE,
+        )
+        self.assertEqual(matcher.match("HTTPS://(ORG,ARCHIVE,)/"), {1, 3})
+        self.assertEqual(matcher.match("HTTPS://(ORG,ARCHIVE,"), {1, 2, 3})
+
+
+class ClassifySurtTestCase(unittest.TestCase):
+
+    def test_classify(self):
+        self.assertEqual(classify_surt("http://(org,"), (EXACT, "http://(org,"))
+        self.assertEqual(classify_surt("http://(org,%"), (PREFIX, "http://(org,"))
+        self.assertEqual(classify_surt("%"), (PREFIX, ""))
+        self.assertEqual(classify_surt("http://(%,)/"), (WILDCARD, None))
+        self.assertEqual(classify_surt("http://(org,_%"), (WILDCARD, None))
+        self.assertEqual(classify_surt("http://(org,%%"), (WILDCARD, None))
+
+    def test_classify_escapes(self):
+        self.assertEqual(
+            classify_surt("http://(org,\\%", POSTGRES_LIKE), (EXACT, "http://(org,%")
+        )
+        self.assertEqual(
+            classify_surt("http://(org,\\%", SQLITE_LIKE), (PREFIX, "http://(org,\\")
+        )
+
+    def test_like_to_regex(self):
+        regex = like_to_regex("http://(org,%,)/a_c", POSTGRES_LIKE)
+        self.assertTrue(regex.fullmatch("http://(org,archive,)/abc"))
+        self.assertTrue(regex.fullmatch("http://(org,,)/a\nc"))
+        self.assertFalse(regex.fullmatch("http://(org,archive,)/abcd"))
+        self.assertFalse(regex.fullmatch("http://(org,archive,)/ABC"))
+        regex = like_to_regex("http://(org,%,)/a_c", SQLITE_LIKE)
+        self.assertTrue(regex.fullmatch("HTTP://(ORG,ARCHIVE,)/ABC"))
+        # SQLite only folds the case of ASCII characters.
+        self.assertFalse(like_to_regex("é", SQLITE_LIKE).fullmatch("É"))
+        self.assertTrue(like_to_regex("100\\%", POSTGRES_LIKE).fullmatch("100%"))
+        self.assertFalse(like_to_regex("100\\%", POSTGRES_LIKE).fullmatch("1000"))
+
+
+class SurtMatchKeyTestCase(unittest.TestCase):
+
+    def test_match_key(self):
+        self.assertEqual(
+            surt_match_key("https://(org,archive,"), ("https://(org,archive,", False)
+        )
+        self.assertEqual(
+            surt_match_key("https://(org,archive,)/so%"),
+            ("https://(org,archive,)", True),
+        )
+        self.assertEqual(
+            surt_match_key("https://(org,arch_ve,)%"), ("https://(org,", True)
+        )
+        self.assertEqual(surt_match_key("%"), ("", True))
+        self.assertEqual(
+            surt_match_key("HTTP://(ORG,", SQLITE_LIKE), ("http://(org,", False)
+        )
+        self.assertEqual(
+            surt_match_key("http://(org,\\%", POSTGRES_LIKE), ("http://(org,%", False)
+        )
+
+    def test_match_prefixes(self):
+        self.assertEqual(
+            surt_match_prefixes("https://(Org,a)/b"),
+            ["", "https:", "https:/", "https://(", "https://(Org,"]
+            + ["https://(Org,a", "https://(Org,a)", "https://(Org,a)/b"],
+        )
+        self.assertEqual(surt_match_prefixes("HTTP", SQLITE_LIKE), ["", "http"])
+
+    def test_same_as_like(self):
+        patterns = [
+            "%",
+            "https://(org,archive,",
+            "https://(org,archive,%",
+            "https://(org,archive,)/so%",
+            "https://(org,%,)/some/page",
+            "https://(org,arch_ve,)%",
+            "HTTPS://(ORG,archive,)/%",
+            "https://(org,archive,)/some/pag_",
+        ]
+        surts = [
+            "",
+            "https://(org,archive,",
+            "https://(org,archive,)",
+            "https://(org,archive,)/some/page",
+            "https://(org,archives,)/some/page",
+            "HTTPS://(ORG,ARCHIVE,)/SOME",
+        ]
+        for dialect in (POSTGRES_LIKE, SQLITE_LIKE):
+            for pattern in patterns:
+                prefix, has_wildcard = surt_match_key(pattern, dialect)
+                regex = like_to_regex(pattern, dialect)
+                for surt in surts:
+                    prefixes = surt_match_prefixes(surt, dialect)
+                    if has_wildcard:
+                        matches = prefix in prefixes and bool(regex.fullmatch(surt))
+                    else:
+                        matches = prefix == prefixes[-1]
+                    self.assertEqual(
+                        matches, bool(regex.fullmatch(surt)), (pattern, surt, dialect)
+                    )
+
+
+class LikeDialectTestCase(unittest.TestCase):
+
+    def test_using(self):
+        with mock.patch("rules.utils.matcher.read_alias", return_value="missing"):
+            self.assertEqual(like_dialect("default"), SQLITE_LIKE)
+
+
+class RulesQueryMatcherTestCase(TestCase):
+
+    SURTS = [
+        "https://(org,archive,",
+        "https://(org,archive,%",
+        "https://(org,archive,)/some%",
+        "https://(org,%,)/some/page",
+        "https://(org,arch_ve,)%",
+        "https://(com,example,)/",
+    ]
+
+    def setUp(self):
+        for surt in self.SURTS:
+            Rule(surt=surt, policy="block").save()
+
+    def test_match_keys_same_as_like(self):
+        for surt in (
+            "https://(org,archive,",
+            "https://(org,archive,)/some/page",
+            "https://(org,archive,)/something",
+            "https://(com,example,)/page",
+            "HTTPS://(ORG,ARCHIVE,)/SOME",
+        ):
+            expected = set(
+                Rule.objects.extra(where=["%s LIKE surt"], params=[surt]).values_list(
+                    "id", flat=True
+                )
+            )
+            actual = set(rules_query(surt).values_list("id", flat=True))
+            self.assertEqual(actual, expected, surt)
@@ -0,0 +1,287 @@
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+import unittest
+
+from django.test import TestCase
+
+from rules.models import Rule
+from rules.utils.ruleset import (
+    CompiledRuleset,
+    Request,
+    get_ruleset,
+)
+from rules.views import rules_query
+
+
+class CompiledRulesetTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.now(timezone.utc)
+        self.rules = [
+            Rule(id=1, policy="allow", surt="https://(org,%"),
+            Rule(id=2, policy="block", surt="https://(org,archive,)/%"),
+            Rule(
+                id=3,
+                policy="allow",
+                surt="https://(org,archive,)/%",
+                ip_range_start="10.0.0.0",
+                ip_range_end="10.0.0.255",
+            ),
+            Rule(
+                id=4,
+                policy="message",
+                surt="https://(org,archive,)/page",
+                status_code=404,
+                public_comment="gone",
+            ),
+            Rule(
+                id=5,
+                policy="rewrite-all",
+                surt="https://(org,archive,)/%",
+                rewrite_from="zeus",
+                rewrite_to="jupiter",
+                content_type="text/html",
+            ),
+            Rule(
+                id=6,
+                policy="rewrite-js",
+                surt="https://(org,%",
+                rewrite_from="ares",
+                rewrite_to="mars",
+                warc_match=r"^CRAWL-\d+",
+            ),
+            Rule(
+                id=7,
+                policy="block",
+                surt="https://(org,archive,)/%",
+                capture_date_start=self.now - timedelta(days=2),
+                capture_date_end=self.now - timedelta(days=1),
+                environment="test",
+            ),
+            Rule(
+                id=8,
+                policy="auth",
+                surt="https://(org,archive,)/embargoed%",
+                seconds_since_capture=3600,
+                neg_surt="https://(org,archive,)/embargoed/public%",
+            ),
+        ]
+        self.ruleset = CompiledRuleset(self.rules)
+
+    def decide(self, surt, **kwargs):
+        rule, rewrites = self.ruleset.decide(Request(surt, **kwargs))
+        return (rule.id if rule else None, [rewrite.id for rewrite in rewrites])
+
+    def test_most_specific_wins(self):
+        self.assertEqual(
+            self.decide("https://(org,example,)/", warc_name="CRAWL-1.warc.gz"),
+            (1, [6]),
+        )
+        self.assertEqual(
+            self.decide(
+                "https://(org,archive,)/",
+                client_ip="10.0.0.1",
+                content_type="text/html",
+                warc_name="CRAWL-1.warc.gz",
+            ),
+            (3, [6, 5]),
+        )
+        self.assertEqual(self.decide("https://(com,example,)/"), (None, []))
+
+    def test_missing_attributes(self):
+        # Rules scoped to an attribute the request doesn't have don't apply:
+        # the IP-scoped allow rule doesn't beat the broader block.
+        self.assertEqual(self.decide("https://(org,archive,)/"), (2, []))
+        self.assertEqual(
+            self.decide("https://(org,archive,)/page", client_ip="10.0.0.1")[0], 3
+        )
+        ruleset = CompiledRuleset(rule for rule in self.rules if rule.id != 3)
+        embargoed = Request("https://(org,archive,)/embargoed")
+        self.assertEqual(ruleset.decide(embargoed)[0].id, 2)
+
+    def test_ip_range(self):
+        self.assertEqual(
+            self.decide("https://(org,archive,)/", client_ip="10.0.1.1"), (2, [])
+        )
+        self.assertEqual(
+            self.decide("https://(org,archive,)/", client_ip="10.0.0.1"), (3, [])
+        )
+        self.assertEqual(
+            self.decide("https://(org,archive,)/", client_ip="::1"), (2, [])
+        )
+        self.rules.append(
+            Rule(
+                id=9,
+                policy="allow",
+                surt="https://(org,archive,)/%",
+                ip_range_start="2001:db8::",
+                ip_range_end="2001:db8::ffff",
+            )
+        )
+        self.ruleset = CompiledRuleset(self.rules)
+        self.assertEqual(
+            self.decide("https://(org,archive,)/", client_ip="2001:db8::1")[0], 9
+        )
+        self.assertEqual(
+            self.decide("https://(org,archive,)/", client_ip="10.0.0.1")[0], 3
+        )
+
+    def test_status_code(self):
+        self.assertEqual(
+            self.decide("https://(org,archive,)/page", status_code=404)[0], 4
+        )
+        self.assertEqual(
+            self.decide(
+                "https://(org,archive,)/page", status_code=200, client_ip="10.0.0.1"
+            )[0],
+            3,
+        )
+
+    def test_content_type_and_warc_match(self):
+        self.assertEqual(
+            self.decide(
+                "https://(org,archive,)/",
+                content_type="TEXT/HTML; charset=utf-8",
+                warc_name="CRAWL-1.warc.gz",
+            )[1],
+            [6, 5],
+        )
+        self.assertEqual(
+            self.decide(
+                "https://(org,archive,)/",
+                content_type="image/gif",
+                warc_name="OTHER-1.warc.gz",
+            )[1],
+            [],
+        )
+
+    def test_environment_and_capture_date(self):
+        capture_date = self.now - timedelta(hours=36)
+        self.assertEqual(
+            self.decide(
+                "https://(org,archive,)/",
+                environment="test",
+                capture_date=capture_date,
+            ),
+            (7, []),
+        )
+        self.assertEqual(
+            self.decide(
+                "https://(org,archive,)/",
+                environment="test",
+                capture_date=self.now,
+            ),
+            (None, []),
+        )
+
+    def test_seconds_since_capture_and_neg_surt(self):
+        ruleset = CompiledRuleset(rule for rule in self.rules if rule.id != 3)
+        recent = Request("https://(org,archive,)/embargoed", capture_date=self.now)
+        self.assertEqual(ruleset.decide(recent)[0].id, 8)
+        old = Request(
+            "https://(org,archive,)/embargoed",
+            capture_date=self.now - timedelta(hours=2),
+        )
+        self.assertEqual(ruleset.decide(old)[0].id, 2)
+        public = Request(
+            "https://(org,archive,)/embargoed/public", capture_date=self.now
+        )
+        self.assertEqual(ruleset.decide(public)[0].id, 2)
+
+    def test_date_slices(self):
+        # Many rules for one SURT, each covering a different day.
+        ruleset = CompiledRuleset(
+            Rule(
+                id=day,
+                policy="block",
+                surt="https://(org,archive,)/%",
+                capture_date_start=self.now - timedelta(days=day + 1),
+                capture_date_end=self.now - timedelta(days=day),
+                retrieve_date_end=self.now + timedelta(days=day),
+            )
+            for day in range(1, 30)
+        )
+        for day in (1, 7, 29):
+            self.assertEqual(
+                ruleset.match(
+                    Request(
+                        "https://(org,archive,)/",
+                        capture_date=self.now - timedelta(days=day, hours=12),
+                    )
+                ),
+                [ruleset.rules[day]],
+            )
+        # Windows exclude their endpoints.
+        self.assertEqual(
+            ruleset.match(
+                Request(
+                    "https://(org,archive,)/",
+                    capture_date=self.now - timedelta(days=2),
+                )
+            ),
+            [],
+        )
+        later = Request(
+            "https://(org,archive,)/",
+            capture_date=self.now - timedelta(days=29, hours=12),
+            retrieve_date=self.now + timedelta(days=29),
+        )
+        self.assertEqual(ruleset.match(later), [])
+        later.capture_date = None
+        self.assertEqual(ruleset.match(later), [])
+        later.retrieve_date = self.now + timedelta(days=28, hours=12)
+        self.assertEqual(ruleset.match(later), [])
+        later.capture_date = self.now - timedelta(days=29, hours=12)
+        self.assertEqual(ruleset.match(later), [ruleset.rules[29]])
+
+    def test_query(self):
+        self.assertEqual(
+            [rule.id for rule in self.ruleset.query("https://(org,archive,)/page")],
+            [1, 6, 2, 3, 5, 7, 4],
+        )
+        self.assertEqual(
+            [
+                rule.id
+                for rule in self.ruleset.query(
+                    "https://(org,archive,)/page", capture_date=self.now
+                )
+            ],
+            [1, 6, 2, 3, 5, 4],
+        )
+
+
+class RulesetQueryTestCase(TestCase):
+
+    def test_same_as_sql(self):
+        now = datetime.now(timezone.utc)
+        for days in range(-3, 4):
+            Rule(
+                surt="https://(org,archive,)/%",
+                policy="block",
+                capture_date_start=now + timedelta(days=days - 1),
+                capture_date_end=now + timedelta(days=days),
+            ).save()
+            Rule(
+                surt="https://(org,archive,",
+                policy="block",
+                retrieve_date_start=now + timedelta(days=days),
+                collection="Planets" if days % 2 else "",
+            ).save()
+        ruleset = get_ruleset()
+        for capture_date in (None, now, now - timedelta(days=2, hours=1)):
+            for collection in (None, "Planets", "Moons"):
+                for surt in ("https://(org,archive,", "https://(org,archive,)/a"):
+                    expected = list(
+                        rules_query(
+                            surt, collection=collection, capture_date=capture_date
+                        ).order_by("surt", "id")
+                    )
+                    self.assertEqual(
+                        ruleset.query(
+                            surt, collection=collection, capture_date=capture_date
+                        ),
+                        expected,
+                    )
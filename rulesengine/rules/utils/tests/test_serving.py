@@ -0,0 +1,157 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.db import connections
+from django.test import (
+    TestCase,
+    override_settings,
+)
+
+from rules.models import (
+    Rule,
+    RulesetVersion,
+)
+from rules.routers import (
+    STICKY_PRIMARY_COOKIE,
+    replica_reads,
+)
+from rules.utils.matcher import (
+    POSTGRES_LIKE,
+    SQLITE_LIKE,
+    like_dialect,
+)
+from rules.utils.serving import (
+    ServingDatabaseError,
+    build_serving_db,
+)
+from rules.views import rules_query
+
+
+class ServingDatabaseTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "rules.sqlite3")
+        Rule(surt="https://(org,archive,)/%", policy="block").save()
+        Rule(surt="https://(org,example,", policy="allow", enabled=False).save()
+
+    def query(self, sql):
+        db = sqlite3.connect("file:{}?mode=ro".format(self.path), uri=True)
+        try:
+            return db.execute(sql).fetchall()
+        finally:
+            db.close()
+
+    def test_build_serving_db(self):
+        version = build_serving_db(self.path)
+        self.assertEqual(version, RulesetVersion.current())
+        self.assertEqual(
+            self.query("SELECT surt, surt_prefix, surt_has_wildcard FROM rules_rule"),
+            [("https://(org,archive,)/%", "https://(org,archive,)", 1)],
+        )
+        self.assertEqual(
+            self.query("SELECT version FROM rules_rulesetversion"), [(version,)]
+        )
+        meta = dict(self.query("SELECT key, value FROM rules_serving"))
+        self.assertEqual(meta["ruleset_version"], str(version))
+        self.assertEqual(meta["like_case_insensitive"], "1")
+        self.assertIn(
+            ("rules_rule_enabled_match_idx",),
+            self.query("SELECT name FROM sqlite_master WHERE type = 'index'"),
+        )
+        # A new build replaces the file.
+        Rule(surt="https://(org,example,", policy="block").save()
+        self.assertGreater(build_serving_db(self.path), version)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM rules_rule"), [(2,)])
+        self.assertEqual(os.listdir(self.directory.name), ["rules.sqlite3"])
+
+    def test_inconsistent_serving_db(self):
+        with mock.patch.object(RulesetVersion, "current", side_effect=range(100)):
+            with self.assertRaises(ServingDatabaseError):
+                build_serving_db(self.path, retries=2)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+
+@override_settings(RULES_READ_REPLICAS=["serving"], RULES_SERVING_DB_MMAP_SIZE=1 << 20)
+class ServingReadsTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "rules.sqlite3")
+        Rule(surt="https://(org,archive,)/%", policy="block").save()
+        Rule(surt="https://(org,archive,)/a_c", policy="allow").save()
+        Rule(surt="https://(org,archive,)/details", policy="allow").save()
+        Rule(surt="https://(org,archive,)/DETAILS", policy="block").save()
+        Rule(surt="https://(org,archive,", policy="allow", enabled=False).save()
+        Rule(surt="http://(com,example,)/", policy="block").save()
+
+    def serve(self):
+        """Build the serving database and register it as in settings.py when
+        RULES_SERVING_DB is set."""
+        build_serving_db(self.path)
+        connections.databases["serving"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": "file:{}?mode=ro&immutable=1".format(self.path),
+            "OPTIONS": {"uri": True},
+            "RULES_SERVING": True,
+        }
+        connections.ensure_defaults("serving")
+        connections.prepare_test_settings("serving")
+
+        def cleanup():
+            connections["serving"].close()
+            del connections["serving"]
+            del connections.databases["serving"]
+
+        self.addCleanup(cleanup)
+        return connections["serving"]
+
+    def test_connection(self):
+        connection = self.serve()
+        with replica_reads():
+            self.assertEqual(like_dialect(), SQLITE_LIKE)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA mmap_size")
+            self.assertEqual(cursor.fetchone(), (1 << 20,))
+            cursor.execute("SELECT 'A' LIKE 'a'")
+            self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_case_sensitive_connection(self):
+        with mock.patch("rules.utils.serving.like_dialect", return_value=POSTGRES_LIKE):
+            connection = self.serve()
+        with replica_reads():
+            self.assertEqual(like_dialect(), POSTGRES_LIKE)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 'A' LIKE 'a'")
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_reads(self):
+        self.serve()
+        surts = [
+            "https://(org,archive,)/details",
+            "https://(org,archive,)/abc",
+            "https://(org,archive,",
+            "http://(com,example,)/",
+            "http://(com,example,)/other",
+        ]
+        for surt in surts:
+            primary = {rule.id for rule in rules_query(surt)}
+            with replica_reads():
+                self.assertEqual({rule.id for rule in rules_query(surt)}, primary)
+            response = self.client.get("/rules/tree/{}".format(surt))
+            self.client.cookies[STICKY_PRIMARY_COOKIE] = "1"
+            try:
+                expected = self.client.get("/rules/tree/{}".format(surt))
+            finally:
+                del self.client.cookies[STICKY_PRIMARY_COOKIE]
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), expected.json())
+        # Rules written after the build are only read from the primary.
+        Rule(surt="http://(com,example,)/%", policy="allow").save()
+        with replica_reads():
+            self.assertEqual(len(rules_query("http://(com,example,)/other")), 0)
+        self.assertEqual(len(rules_query("http://(com,example,)/other")), 1)
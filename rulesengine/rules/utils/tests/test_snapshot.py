@@ -0,0 +1,67 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from rules.models import (
+    Rule,
+    RulesetVersion,
+)
+from rules.utils.snapshot import (
+    SnapshotError,
+    build_snapshot,
+    get_snapshot,
+    latest_snapshot,
+)
+
+
+class SnapshotTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        Rule(surt="https://(org,archive,", policy="block").save()
+        Rule(surt="https://(org,example,", policy="allow", enabled=False).save()
+
+    def read(self, path):
+        with gzip.open(path, "rb") as snapshot:
+            return [json.loads(line) for line in snapshot]
+
+    def test_build_snapshot(self):
+        version, path = build_snapshot(self.directory.name)
+        self.assertEqual(version, RulesetVersion.current())
+        header, *rules = self.read(path)
+        self.assertEqual(header, {"format_version": 1, "ruleset_version": version})
+        self.assertEqual([rule["surt"] for rule in rules], ["https://(org,archive,"])
+        self.assertEqual(latest_snapshot(self.directory.name), (version, path))
+
+    def test_get_snapshot_is_cached(self):
+        version, snapshot = get_snapshot(self.directory.name)
+        self.addCleanup(snapshot.close)
+        path = snapshot.name
+        with mock.patch("rules.utils.snapshot.build_snapshot") as build:
+            cached_version, cached = get_snapshot(self.directory.name)
+        cached.close()
+        self.assertEqual((cached_version, cached.name), (version, path))
+        build.assert_not_called()
+        Rule(surt="https://(org,example,", policy="block").save()
+        new_version, new_snapshot = get_snapshot(self.directory.name)
+        new_snapshot.close()
+        self.assertGreater(new_version, version)
+        self.assertEqual(len(self.read(new_snapshot.name)), 3)
+        # Older snapshots are removed, but stay readable by those who opened
+        # them.
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(len(gzip.decompress(snapshot.read()).splitlines()), 2)
+
+    def test_inconsistent_snapshot(self):
+        with mock.patch.object(
+            RulesetVersion, "current", side_effect=range(100)
+        ) as current:
+            with self.assertRaises(SnapshotError):
+                build_snapshot(self.directory.name, retries=2)
+        self.assertEqual(current.call_count, 4)
+        self.assertEqual(os.listdir(self.directory.name), [])
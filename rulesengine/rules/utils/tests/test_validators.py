@@ -3,7 +3,10 @@ from unittest import TestCase
 
 from jsonschema import ValidationError
 
-from rules.utils.validators import validate_rule_json
+from rules.utils.validators import (
+    validate_rule_json,
+    validate_rules_json,
+)
 
 
 class ValidateRuleJSONTestCase(TestCase):
@@ -53,6 +56,47 @@ class ValidateRuleJSONTestCase(TestCase):
         except Exception:
             self.fail("validate_rule_json unexpectedly raised an exception")
 
+    def test_normalized_values(self):
+        values = {
+            "policy": "block",
+            "enabled": True,
+            "environment": "prod",
+            "surt": "http://(",
+            "capture_date": {"start": "2020-01-01T00:00:00", "end": None},
+            "ip_range": {"start": "4.4.4.4", "end": "8.8.8.8"},
+        }
+        with self.assertRaises(ValidationError):
+            validate_rule_json(values)
+        values["capture_date"]["end"] = self.now.isoformat()
+        normalized = validate_rule_json(values)
+        self.assertEqual(
+            normalized["capture_date"],
+            {"start": datetime(2020, 1, 1), "end": self.now},
+        )
+        self.assertEqual(normalized["ip_range"], values["ip_range"])
+        self.assertEqual(values["capture_date"]["end"], self.now.isoformat())
+
+    def test_validate_many(self):
+        rule = {
+            "policy": "block",
+            "enabled": True,
+            "environment": "prod",
+            "surt": "http://(",
+            "retrieve_date": {"start": "2020-01-01", "end": "2021-01-01"},
+        }
+        bad_date = dict(rule, retrieve_date={"start": "bad-wolf", "end": "2021"})
+        results = validate_rules_json([rule, {}, bad_date, rule])
+        self.assertEqual(
+            [error is None for values, error in results], [True, False, False, True]
+        )
+        self.assertEqual(results[0][0]["retrieve_date"]["end"], datetime(2021, 1, 1))
+        self.assertIs(
+            results[0][0]["retrieve_date"]["start"],
+            results[3][0]["retrieve_date"]["start"],
+        )
+        self.assertIsInstance(results[1][1], ValidationError)
+        self.assertEqual(results[2][1].args[0][0], "retrieve start date")
+
     def test_schema_fail(self):
         with self.assertRaises(ValidationError) as context:
             validate_rule_json({})
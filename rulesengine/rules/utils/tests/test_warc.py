@@ -0,0 +1,37 @@
+import unittest
+
+from rules.utils.warc import WarcMatcher
+
+
+class WarcMatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = WarcMatcher(
+            [
+                (1, r"^CRAWL-\d+"),
+                (2, r"warc"),
+                (3, r"(a)\1"),
+                (4, r"(?i)WARC"),
+                (5, r"["),
+                (6, r"x$"),
+                (7, r"warc"),
+                (8, r"(?P<name>w)arc"),
+                (9, r"(?P<name>c)rawl"),
+            ],
+            group_size=3,
+        )
+
+    def test_match(self):
+        self.assertEqual(self.matcher.match("CRAWL-12.warc.gz"), {1, 2, 4, 7, 8})
+        self.assertEqual(self.matcher.match("aa.WARC"), {3, 4})
+        self.assertEqual(self.matcher.match("zzx"), {6})
+        self.assertEqual(self.matcher.match("crawl-1.warc"), {2, 4, 7, 8, 9})
+
+    def test_match_candidates(self):
+        self.assertEqual(self.matcher.match("CRAWL-1.warc", [1, 6, 9]), {1})
+        self.assertEqual(self.matcher.match("CRAWL-1.warc", []), set())
+
+    def test_invalid(self):
+        self.assertFalse(self.matcher.add(10, r"("))
+        self.assertTrue(self.matcher.add(11, r"\("))
+        self.assertEqual(self.matcher.match("(", [5, 10, 11]), {11})
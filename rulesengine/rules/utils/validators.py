@@ -1,7 +1,7 @@
-from dateutil.parser import parse as parse_date
 import ipaddr
 import jsonschema
 
+from rules.utils.dates import parse_date
 
 POLICY_CHOICES = (
     ("block", "Block playback"),
@@ -81,33 +81,91 @@ SCHEMA = {
 }
 
 
+# The schema is checked and its validator built once, rather than on every
+# call to `jsonschema.validate`.
+jsonschema.Draft4Validator.check_schema(SCHEMA)
+VALIDATOR = jsonschema.Draft4Validator(SCHEMA)
+
+# The fields holding a start and end value which must be parsed, with the
+# parser and the name of the field in errors.
+RANGE_FIELDS = (
+    ("capture_date", parse_date, "capture {} date"),
+    ("retrieve_date", parse_date, "retrieve {} date"),
+    ("ip_range", ipaddr.IPAddress, "ip range {}"),
+)
+
+
+def _validate(input, parse):
+    VALIDATOR.validate(input)
+    values = dict(input)
+    for field, parser, name in RANGE_FIELDS:
+        if field not in input:
+            continue
+        parsed = {}
+        for end in ("start", "end"):
+            try:
+                parsed[end] = parse(parser, input[field][end])
+            except ValueError as e:
+                raise ValueError((name.format(end), e))
+        if parser is parse_date:
+            values[field] = parsed
+    return values
+
+
 def validate_rule_json(input):
-    """Validate incoming JSON against a schema."""
-    jsonschema.validate(input, SCHEMA)
-    if "capture_date" in input:
-        try:
-            parse_date(input["capture_date"]["start"])
-        except ValueError as e:
-            raise ValueError(("capture start date", e))
-        try:
-            parse_date(input["capture_date"]["end"])
-        except ValueError as e:
-            raise ValueError(("capture end date", e))
-    if "retrieve_date" in input:
-        try:
-            parse_date(input["retrieve_date"]["start"])
-        except ValueError as e:
-            raise ValueError(("retrieve start date", e))
-        try:
-            parse_date(input["retrieve_date"]["end"])
-        except ValueError as e:
-            raise ValueError(("retrieve end date", e))
-    if "ip_range" in input:
-        try:
-            ipaddr.IPAddress(input["ip_range"]["start"])
-        except ValueError as e:
-            raise ValueError(("ip range start", e))
+    """Validate incoming JSON against a schema.
+
+    Each date and IP address is parsed once.
+
+    Arguments:
+    input -- The JSON values of a rule, as a dict.
+
+    Returns:
+    A copy of the values with the dates parsed into datetimes, which can be
+    given to `populate` without validating them again.
+    """
+    return _validate(input, lambda parser, value: parser(value))
+
+
+def validate_rules_json(inputs):
+    """Validate the JSON values of many rules, as `validate_rule_json` does.
+
+    Values repeated across rules, such as the dates of a batch of rules made
+    at once, are only parsed once.
+
+    Arguments:
+    inputs -- A list of the JSON values of rules.
+
+    Returns:
+    A list of (values, error) pairs, one per rule: the validated values and
+    None, or None and the exception the values failed validation with.
+    """
+    parsed = {}
+
+    def parse(parser, value):
+        if (parser, value) not in parsed:
+            parsed[(parser, value)] = parser(value)
+        return parsed[(parser, value)]
+
+    results = []
+    for input in inputs:
         try:
-            ipaddr.IPAddress(input["ip_range"]["end"])
-        except ValueError as e:
-            raise ValueError(("ip range end", e))
+            results.append((_validate(input, parse), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def to_datetime(value):
+    """Parse a date string, passing datetimes through.
+
+    Arguments:
+    value -- A date string, a datetime (as `validate_rule_json` gives) or
+        None.
+
+    Returns:
+    A datetime, or None.
+    """
+    if isinstance(value, str):
+        return parse_date(value)
+    return value
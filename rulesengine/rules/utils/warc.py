@@ -0,0 +1,121 @@
+import re
+
+# Patterns which refer to their own groups by number or name can't be
+# embedded in a larger pattern without changing their meaning.
+_SELF_REFERENCE_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+class WarcMatcher(object):
+    """Tests a WARC name against the `warc_match` patterns of many rules at
+    once.
+
+    Distinct patterns are combined into groups of up to `group_size`, each
+    compiled to a single regular expression made of one optional lookahead
+    per pattern, with a named group per pattern recording whether it matched
+    (the equivalent of `re.search`). A single `match` call on each group then
+    tells which of its patterns match.
+    """
+
+    def __init__(self, patterns=(), group_size=100):
+        """Build the matcher.
+
+        Arguments:
+        patterns -- An iterable of (rule id, regular expression) pairs.
+        group_size -- The maximum number of patterns per combined regular
+            expression.
+        """
+        self.group_size = group_size
+        self.rule_ids = {}
+        self._groups = None
+        for rule_id, pattern in patterns:
+            self.add(rule_id, pattern)
+
+    def add(self, rule_id, pattern):
+        """Add a rule's pattern to the matcher.
+
+        Returns:
+        False if the pattern isn't a valid regular expression, in which case
+        the rule never matches.
+        """
+        try:
+            re.compile(pattern)
+        except re.error:
+            return False
+        self.rule_ids.setdefault(pattern, []).append(rule_id)
+        self._groups = None
+        return True
+
+    def _compile(self):
+        """Compile the combined regular expressions.
+
+        Returns:
+        A list of (regex, {group name: pattern}) pairs for the combined
+        patterns and a list of (regex, pattern) pairs for the patterns which
+        must be searched for on their own.
+        """
+        groups = []
+        singles = []
+        combinable = []
+        for pattern in self.rule_ids:
+            if _SELF_REFERENCE_RE.search(pattern):
+                singles.append((re.compile(pattern), pattern))
+            else:
+                combinable.append(pattern)
+        for start in range(0, len(combinable), self.group_size):
+            end = start + self.group_size
+            names = {}
+            for i, pattern in enumerate(combinable[start:end]):
+                names["p{}".format(i)] = pattern
+            try:
+                regex = re.compile(
+                    "".join(
+                        "(?=[\\s\\S]*?(?P<{}>{}))?".format(name, pattern)
+                        for name, pattern in names.items()
+                    )
+                )
+            except re.error:
+                # Patterns with inline flags or clashing group names can only
+                # be compiled on their own.
+                singles.extend(
+                    (re.compile(pattern), pattern) for pattern in names.values()
+                )
+                continue
+            groups.append((regex, names))
+        return groups, singles
+
+    def match(self, warc_name, rule_ids=None):
+        """Find the rules whose pattern matches a WARC name.
+
+        Arguments:
+        warc_name -- The WARC name to test.
+        rule_ids -- If given, only test the patterns of these rules.
+
+        Returns:
+        A set of the ids of the matching rules.
+        """
+        if self._groups is None:
+            self._groups = self._compile()
+        groups, singles = self._groups
+        if rule_ids is not None:
+            wanted = set(rule_ids)
+            if not wanted:
+                return set()
+        matches = set()
+        for regex, names in groups:
+            if rule_ids is not None and not any(
+                wanted.intersection(self.rule_ids[pattern])
+                for pattern in names.values()
+            ):
+                continue
+            found = regex.match(warc_name)
+            for name, value in found.groupdict().items():
+                if value is not None:
+                    matches.update(self.rule_ids[names[name]])
+        for regex, pattern in singles:
+            if rule_ids is not None and not wanted.intersection(self.rule_ids[pattern]):
+                continue
+            if regex.search(warc_name):
+                matches.update(self.rule_ids[pattern])
+        if rule_ids is not None:
+            matches &= wanted
+        return matches
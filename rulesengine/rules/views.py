@@ -1,13 +1,64 @@
-from dateutil.parser import parse as parse_date
+import base64
 import json
+import os
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router
+from django.db.models import Q
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.timezone import (
+    is_naive,
+    make_aware,
+    utc,
+)
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import (
+    etag,
+    require_POST,
+)
 from django.views.generic.detail import SingleObjectMixin
 
-from .models import Rule
+from .models import (
+    Rule,
+    RuleChange,
+)
+from .routers import read_from_replica
+from .utils.bulk import apply_operations
+from .utils.dates import parse_date
+from .utils.etags import (
+    lookup_etag,
+    rules_etag,
+    rules_lookup_etag,
+    snapshot_etag,
+)
 from .utils.json import (
+    encode_list,
+    encode_summaries,
     error,
+    get_summary_cache,
+    ndjson_stream,
     success,
+    success_encoded,
+    success_stream,
+)
+from .utils.matcher import (
+    like_dialect,
+    like_escape_sql,
+    surt_match_prefixes,
+)
+from .utils.ruleset import (
+    DEFAULT_POLICY,
+    Request,
+    get_ruleset,
+)
+from .utils.snapshot import (
+    SnapshotError,
+    get_snapshot,
 )
 from .utils.validators import validate_rule_json
 
@@ -15,15 +66,71 @@ from .utils.validators import validate_rule_json
 class RulesView(View):
     """Contains RESTful views for dealing with the rules collection."""
 
+    # Fields which rules can be filtered on by value.
+    FILTERS = ("policy", "environment", "collection", "partner")
+
+    @method_decorator(read_from_replica)
+    @method_decorator(etag(rules_etag))
     def get(self, request, *args, **kwargs):
-        """Gets a list of all rules."""
+        """Gets a list of all rules.
+
+        Query string parameters:
+        surt-exact -- Only get rules with this SURT.
+        surt-start -- Only get rules whose SURT starts with this.
+        policy, environment, collection, partner -- Only get rules with this
+            value of the field.
+        limit -- Get a page of at most this many rules (and at most
+            RULES_PAGE_SIZE), ordered by SURT and id. The Link header of the
+            response points to the next page, if there is one.
+        after -- The cursor of the page to get, as found in a Link header.
+        format -- json (the default) or ndjson, for one rule per line.
+
+        Without a limit, the rules are streamed straight from a database
+        cursor."""
         if request.GET.get("surt-exact") is not None:
             rules = Rule.objects.filter(surt=request.GET.get("surt-exact"))
         elif request.GET.get("surt-start") is not None:
             rules = Rule.objects.filter(surt__startswith=request.GET.get("surt-start"))
         else:
             rules = Rule.objects.all()
-        return success([rule.summary() for rule in rules])
+        for field in self.FILTERS:
+            if request.GET.get(field) is not None:
+                rules = rules.filter(**{field: request.GET[field]})
+        ndjson = request.GET.get("format") == "ndjson"
+        if request.GET.get("limit") is None and request.GET.get("after") is None:
+            # The rules are read after the view returns, so choose the
+            # database now.
+            rules = rules.using(rules.db)
+            summaries = (rule.summary() for rule in rules.iterator())
+            if ndjson:
+                return ndjson_stream(summaries)
+            return success_stream(summaries)
+        try:
+            limit = _page_limit(request)
+        except ValueError as e:
+            return error("limit query string param must be a positive integer", str(e))
+        rules = rules.order_by("surt", "id")
+        if request.GET.get("after") is not None:
+            try:
+                surt, rule_id = _decode_cursor(request.GET["after"])
+            except ValueError as e:
+                return error("after query string param must be a cursor", str(e))
+            rules = rules.filter(Q(surt__gt=surt) | Q(surt=surt, id__gt=rule_id))
+        # Get one more rule than needed to find out whether there is a next
+        # page.
+        page = list(rules[: limit + 1])
+        if ndjson:
+            response = ndjson_stream(rule.summary() for rule in page[:limit])
+        else:
+            # Listings don't use the shared summary cache, which only the
+            # lookup views need and which would otherwise keep every rule
+            # listed (disabled or not) until the ruleset version changes.
+            response = success_encoded(encode_summaries(page[:limit], {}))
+        if len(page) > limit:
+            response["Link"] = _next_link(
+                request, after=_encode_cursor(page[limit - 1])
+            )
+        return response
 
     def post(self, request, *args, **kwargs):
         """Creates a single rule in the collection."""
@@ -32,20 +139,109 @@ class RulesView(View):
         except Exception as e:
             return error("unable to marshal json", str(e))
         try:
-            validate_rule_json(new_rule)
+            values = validate_rule_json(new_rule)
         except Exception as e:
             return error("error validating json", str(e))
         rule = Rule()
-        rule.populate(new_rule)
+        rule.populate(values, validate=False)
         rule.save()
         return success(rule.summary())
 
 
+@require_POST
+def rules_bulk(request):
+    """Creates, updates and deletes many rules in a single transaction.
+
+    The request body is a JSON object with:
+    operations -- An array of objects with an `op` (create, update or
+        delete), the `id` of the rule to update or delete, and the `rule`
+        values to create or update it with, as for POST /rules.
+    atomic -- Whether to make no change at all if any operation is invalid
+        (default: false).
+    user -- The user to record in the change of each rule.
+    comment -- The comment to record in the change of each rule.
+
+    The result has a `results` array with, for each operation, its `index`
+    and a `status` of ok (with the rule `id`) or error (with a `message`).
+    Invalid operations are skipped unless the batch is atomic, in which case
+    the response is an error."""
+    try:
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception as e:
+        return error("unable to marshal json", str(e))
+    if not isinstance(body, dict) or not isinstance(body.get("operations"), list):
+        return error("operations must be a json array", {})
+    for key in ("user", "comment"):
+        if not isinstance(body.get(key, ""), str):
+            return error("{} must be a string".format(key), {})
+    atomic = body.get("atomic", False) is True
+    results = apply_operations(
+        body["operations"],
+        atomic=atomic,
+        user=body.get("user", ""),
+        comment=body.get("comment", ""),
+    )
+    errors = [result for result in results if result.get("status") == "error"]
+    if atomic and errors:
+        return error("bulk operations failed", {"results": errors})
+    return success({"results": results})
+
+
+def _page_limit(request):
+    """Get the page size asked for by the `limit` query string param.
+
+    Returns:
+    The limit, which is at most (and by default) RULES_PAGE_SIZE.
+
+    Raises:
+    ValueError if the limit isn't a positive integer.
+    """
+    page_size = getattr(settings, "RULES_PAGE_SIZE", 1000)
+    limit = int(request.GET.get("limit", page_size))
+    if limit < 1:
+        raise ValueError("limit must be positive, not {}".format(limit))
+    return min(limit, page_size)
+
+
+def _next_link(request, **params):
+    """Get a Link header value pointing to the same request with some query
+    string params replaced."""
+    query = request.GET.copy()
+    for key, value in params.items():
+        query[key] = value
+    return '<{}?{}>; rel="next"'.format(request.path, query.urlencode())
+
+
+def _encode_cursor(rule):
+    """Encode the position of a rule in the (surt, id) order as an opaque
+    string."""
+    return base64.urlsafe_b64encode(json.dumps([rule.surt, rule.id]).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor made by `_encode_cursor`.
+
+    Returns:
+    A (surt, id) pair.
+    """
+    position = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if (
+        not isinstance(position, list)
+        or len(position) != 2
+        or not isinstance(position[0], str)
+        or not isinstance(position[1], int)
+    ):
+        raise ValueError("not a rule position: {!r}".format(position))
+    return position[0], position[1]
+
+
 class RuleView(SingleObjectMixin, View):
     """Contains RESTful views for dealing with individual rules."""
 
     model = Rule
 
+    @method_decorator(read_from_replica)
+    @method_decorator(etag(rules_etag))
     def get(self, request, *args, **kwargs):
         """Gets a single rule."""
         rule = self.get_object()
@@ -59,16 +255,15 @@ class RuleView(SingleObjectMixin, View):
         except Exception as e:
             return error("unable to marshal json", str(e))
         try:
-            validate_rule_json(updates)
+            values = validate_rule_json(updates)
         except Exception as e:
             return error("error validating json", str(e))
-        rule.populate(updates)
+        rule.populate(values, validate=False)
         rule.save()
-        change = rule.rule_change.order_by("-id")[0]
         return success(
             {
                 "rule": rule.summary(),
-                "change": change.full_change(),
+                "change": rule.last_change.full_change(),
             }
         )
 
@@ -78,12 +273,21 @@ class RuleView(SingleObjectMixin, View):
         return success({})
 
 
+@read_from_replica
+@etag(rules_lookup_etag)
 def rules_for_surt(request, surt_string=None):
     """Fetches rules for a given surt."""
-    result = [rule.summary() for rule in rules_query(surt_string)]
-    return success(result)
+    if getattr(settings, "RULES_USE_SURT_MATCHER", False):
+        ruleset = get_ruleset()
+        encoded = encode_summaries(ruleset.query(surt_string), ruleset.summaries)
+    else:
+        encoded = encode_summaries(rules_query(surt_string))
+    return success_encoded(encoded)
 
 
+@csrf_exempt
+@read_from_replica
+@etag(rules_lookup_etag)
 def rules_for_request(request):
     """Returns all rules that would apply to a surt, and
        other optional parameters.
@@ -94,27 +298,482 @@ def rules_for_request(request):
         into account.
     collection -- A collection id to match against.
     partner -- A partner id to match against.
-    capture-date -- The date the playback data was captured (ISO 8601)."""
+    capture-date -- The date the playback data was captured (ISO 8601 or a
+        14-digit Wayback Machine timestamp).
+
+    A POST with a JSON array of objects with the same keys looks up each of
+    them, see `rules_for_requests`."""
+    if request.method == "POST":
+        return rules_for_requests(request)
+    surt, params, response = _lookup_params(request)
+    if response is not None:
+        return response
+    if getattr(settings, "RULES_USE_SURT_MATCHER", False):
+        ruleset = get_ruleset()
+        lookup = ruleset.query
+        cache = ruleset.summaries
+    else:
+        lookup = rules_query
+        cache = None
+    return success_encoded(encode_summaries(lookup(surt, **params), cache))
+
+
+def _lookup_params(request):
+    """Parse the query string parameters of `rules_for_request`.
+
+    Returns:
+    A (surt, params, response) triple of the SURT and the other keyword
+    arguments for `rules_query` (or `CompiledRuleset.query`), or of None,
+    None and an error response.
+    """
     surt_qs = request.GET.get("surt")
     if surt_qs is None:
-        return error("surt query string param is required", {})
+        return None, None, error("surt query string param is required", {})
     capture_date_qs = request.GET.get("capture-date")
     capture_date = None
     if capture_date_qs:
         try:
             capture_date = parse_date(capture_date_qs)
         except ValueError as e:
-            return error(
-                "capture-date query string param must be " "a datetime", str(e)
+            return (
+                None,
+                None,
+                error("capture-date query string param must be " "a datetime", str(e)),
             )
-    rules_result = rules_query(
-        surt_qs,
-        neg_surt=request.GET.get("neg-surt"),
-        collection=request.GET.get("collection"),
-        partner=request.GET.get("partner"),
-        capture_date=capture_date,
+    params = {
+        "neg_surt": request.GET.get("neg-surt"),
+        "collection": request.GET.get("collection"),
+        "partner": request.GET.get("partner"),
+        "capture_date": capture_date,
+    }
+    return surt_qs, params, None
+
+
+def rules_for_requests(request):
+    """Returns the rules that would apply to each of a batch of requests.
+
+    The request body is a JSON array of objects with the same keys as the
+    `rules_for_request` query string parameters. The result is an array of
+    rule lists in the same order, which is streamed back as it is computed.
+    """
+    try:
+        lookups = json.loads(request.body.decode("utf-8"))
+    except Exception as e:
+        return error("unable to marshal json", str(e))
+    if not isinstance(lookups, list):
+        return error("request body must be a json array", {})
+    for i, lookup in enumerate(lookups):
+        if not isinstance(lookup, dict) or not isinstance(lookup.get("surt"), str):
+            return error("surt is required", {"index": i})
+        for key in ("neg-surt", "collection", "partner", "capture-date"):
+            if not isinstance(lookup.get(key, ""), (str, type(None))):
+                return error("{} must be a string".format(key), {"index": i})
+        if lookup.get("capture-date"):
+            try:
+                lookup["capture-date"] = parse_date(lookup["capture-date"])
+            except ValueError as e:
+                return error(
+                    "capture-date must be a datetime", {"index": i, "error": str(e)}
+                )
+        else:
+            lookup["capture-date"] = None
+    if getattr(settings, "RULES_USE_SURT_MATCHER", False):
+        ruleset = get_ruleset()
+        cache = ruleset.summaries
+    else:
+        ruleset = None
+        cache = get_summary_cache()
+    # The rules are read after the view returns, so choose the database now.
+    results = rules_query_batch(
+        lookups, ruleset=ruleset, using=router.db_for_read(Rule)
+    )
+    return success_stream(
+        encode_list(encode_summaries(rules_result, cache)) for rules_result in results
+    )
+
+
+async def _async_ruleset():
+    """Get the ruleset version and compiled ruleset from async code, only
+    leaving the event loop when the ruleset version has to be polled.
+    """
+    state = get_ruleset.peek()
+    if state is None:
+        state = await sync_to_async(get_ruleset.fetch)()
+    return state
+
+
+async def _async_lookup(request, lookup):
+    """Answer a GET rule lookup from the compiled ruleset, honoring
+    conditional requests like `rules_lookup_etag` does for the sync views.
+
+    Arguments:
+    request -- The lookup request.
+    lookup -- A function of the CompiledRuleset returning a response.
+    """
+    version, ruleset = await _async_ruleset()
+    etag = quote_etag(lookup_etag(request, version, ruleset.retrieve_index))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = lookup(ruleset)
+    if request.method in ("GET", "HEAD"):
+        response.setdefault("ETag", etag)
+    return response
+
+
+@read_from_replica
+async def async_rules_for_surt(request, surt_string=None):
+    """The async version of `rules_for_surt`, served to ASGI deployments
+    (see `rules.middleware.async_lookup_middleware`).
+
+    Rules are looked up in the compiled ruleset without leaving the event
+    loop. Without RULES_USE_SURT_MATCHER the sync view runs in a thread.
+    """
+    if not getattr(settings, "RULES_USE_SURT_MATCHER", False):
+        return await sync_to_async(rules_for_surt)(request, surt_string=surt_string)
+    return await _async_lookup(
+        request,
+        lambda ruleset: success_encoded(
+            encode_summaries(ruleset.query(surt_string), ruleset.summaries)
+        ),
+    )
+
+
+@read_from_replica
+async def async_rules_for_request(request):
+    """The async version of `rules_for_request`, served to ASGI deployments
+    (see `rules.middleware.async_lookup_middleware`).
+
+    Rules are looked up in the compiled ruleset without leaving the event
+    loop. Batch lookups, and every lookup without RULES_USE_SURT_MATCHER,
+    run the sync view in a thread.
+    """
+    if request.method == "POST" or not getattr(
+        settings, "RULES_USE_SURT_MATCHER", False
+    ):
+        return await sync_to_async(rules_for_request)(request)
+    surt, params, response = _lookup_params(request)
+    if response is not None:
+        return response
+    return await _async_lookup(
+        request,
+        lambda ruleset: success_encoded(
+            encode_summaries(ruleset.query(surt, **params), ruleset.summaries)
+        ),
     )
-    return success([rule.summary() for rule in rules_result])
+
+
+# `csrf_exempt` would wrap the coroutine function in a sync function.
+async_rules_for_request.csrf_exempt = True
+
+
+def rules_query_batch(lookups, chunk_size=None, ruleset=None, using=None):
+    """Retrieves the rules matching each of a list of lookups.
+
+    Lookups are resolved against a compiled ruleset if one is given, or
+    else each chunk of lookups with a single LIKE join.
+
+    Arguments:
+    lookups -- A list of dicts with a `surt` key and optional `neg-surt`,
+        `collection`, `partner` and `capture-date` (a datetime) keys.
+    chunk_size -- How many lookups to resolve at once.
+    ruleset -- A CompiledRuleset to resolve the lookups against.
+    using -- The alias of the database to read rules from.
+
+    Returns:
+    A generator of lists of matching rules, one per lookup.
+    """
+    from datetime import (
+        datetime,
+        timezone,
+    )
+
+    if ruleset is not None:
+        for lookup in lookups:
+            yield ruleset.query(
+                lookup["surt"],
+                neg_surt=lookup.get("neg-surt"),
+                collection=lookup.get("collection"),
+                partner=lookup.get("partner"),
+                capture_date=lookup["capture-date"],
+            )
+        return
+    if chunk_size is None:
+        chunk_size = getattr(settings, "RULES_BATCH_CHUNK_SIZE", 250)
+    now = datetime.now(timezone.utc)
+    for start in range(0, len(lookups), chunk_size):
+        end = start + chunk_size
+        chunk = lookups[start:end]
+        candidates = [[] for lookup in chunk]
+        for rule in _like_join(chunk, using):
+            candidates[rule.batch_index].append(rule)
+        for lookup, rules in zip(chunk, candidates):
+            yield sorted(
+                (
+                    rule
+                    for rule in rules
+                    if _rule_matches(
+                        rule,
+                        now,
+                        neg_surt=lookup.get("neg-surt"),
+                        collection=lookup.get("collection"),
+                        partner=lookup.get("partner"),
+                        capture_date=lookup["capture-date"],
+                    )
+                ),
+                key=lambda rule: rule.surt,
+            )
+
+
+def _like_join(lookups, using=None):
+    """Match a list of lookups against enabled rules' SURT patterns with a
+    single join on their indexed match keys, evaluating the `LIKE` patterns
+    of rules with wildcards only.
+
+    Returns:
+    A RawQuerySet of rules annotated with the `batch_index` of the lookup
+    they match.
+    """
+    # The query may run after the database to read from is no longer the
+    # current one, so take the dialect of the database it runs on.
+    dialect = like_dialect(using)
+    batch = []
+    prefixes = []
+    for i, lookup in enumerate(lookups):
+        batch.extend([i, lookup["surt"]])
+        for prefix in surt_match_prefixes(lookup["surt"], dialect):
+            prefixes.extend([i, prefix])
+    table = Rule._meta.db_table
+    # Rules without wildcards match the whole SURT, which is the only prefix
+    # of the same length.
+    sql = (
+        "WITH batch (batch_index, surt) AS (VALUES {batch}), "
+        "prefixes (batch_index, prefix) AS (VALUES {prefixes}) "
+        "SELECT {table}.*, batch.batch_index FROM prefixes "
+        "JOIN {table} ON {table}.surt_prefix = prefixes.prefix "
+        "JOIN batch ON batch.batch_index = prefixes.batch_index "
+        "WHERE {table}.enabled AND CASE WHEN {table}.surt_has_wildcard "
+        "THEN batch.surt LIKE {table}.surt{escape} "
+        "ELSE LENGTH(prefixes.prefix) = LENGTH(batch.surt) END"
+    ).format(
+        batch=", ".join(["(%s, %s)"] * len(lookups)),
+        prefixes=", ".join(["(%s, %s)"] * (len(prefixes) // 2)),
+        table=table,
+        escape=like_escape_sql(dialect),
+    )
+    return Rule.objects.db_manager(using).raw(sql, batch + prefixes)
+
+
+def _rule_matches(
+    rule, now, neg_surt=None, collection=None, partner=None, capture_date=None
+):
+    """Apply the non-SURT filters of `rules_query` to a single rule."""
+    if rule.retrieve_date_end is not None and not rule.retrieve_date_end > now:
+        return False
+    if rule.retrieve_date_start is not None and not rule.retrieve_date_start < now:
+        return False
+    if neg_surt is not None and rule.neg_surt != neg_surt:
+        return False
+    if collection is not None and rule.collection not in (collection, ""):
+        return False
+    if partner is not None and rule.partner not in (partner, ""):
+        return False
+    if capture_date is not None:
+        if is_naive(capture_date):
+            capture_date = make_aware(capture_date, utc)
+        if rule.capture_date_end is not None and not (
+            rule.capture_date_end > capture_date
+        ):
+            return False
+        if rule.capture_date_start is not None and not (
+            rule.capture_date_start < capture_date
+        ):
+            return False
+    return True
+
+
+def rules_decide(request):
+    """Evaluates every rule against a playback request and returns the
+    effective policy.
+
+    Query string parameters:
+    surt -- The SURT to look up.
+    environment -- The environment of the playback (default: prod).
+    protocol -- The protocol of the URL (default: taken from the SURT).
+    subdomain -- The subdomain canonicalized away from the SURT.
+    client-ip -- The IP address of the client.
+    status-code -- The HTTP status code of the capture.
+    content-type -- The Content-Type of the capture.
+    warc-name -- The name of the WARC file holding the capture.
+    capture-date -- The date the playback data was captured (ISO 8601 or a
+        14-digit Wayback Machine timestamp).
+    retrieve-date -- The date of the playback (in the same formats, default:
+        now).
+    collection -- A collection id to match against.
+    partner -- A partner id to match against.
+
+    Rules with conditions on parameters which aren't given don't apply, so
+    that a rule scoped to some clients (or captures) never decides the policy
+    for a request which doesn't say whether it is one of them. The result has
+    the winning `policy` (allow if no access rule applies), its `rule_id`
+    and `public_comment`, and the applicable rewrite rules in `rewrites`."""
+    surt_qs = request.GET.get("surt")
+    if surt_qs is None:
+        return error("surt query string param is required", {})
+    dates = {}
+    for param in ("capture-date", "retrieve-date"):
+        dates[param] = None
+        if request.GET.get(param):
+            try:
+                dates[param] = parse_date(request.GET[param])
+            except ValueError as e:
+                return error(
+                    "{} query string param must be a datetime".format(param), str(e)
+                )
+    status_code = request.GET.get("status-code")
+    if status_code:
+        try:
+            status_code = int(status_code)
+        except ValueError as e:
+            return error("status-code query string param must be an integer", str(e))
+    try:
+        playback = Request(
+            surt_qs,
+            environment=request.GET.get("environment", "prod"),
+            protocol=request.GET.get("protocol"),
+            subdomain=request.GET.get("subdomain"),
+            client_ip=request.GET.get("client-ip"),
+            status_code=status_code or None,
+            content_type=request.GET.get("content-type"),
+            warc_name=request.GET.get("warc-name"),
+            capture_date=dates["capture-date"],
+            retrieve_date=dates["retrieve-date"],
+            collection=request.GET.get("collection"),
+            partner=request.GET.get("partner"),
+        )
+    except ValueError as e:
+        return error("client-ip query string param must be an ip address", str(e))
+    rule, rewrites = get_ruleset().decide(playback)
+    decision = {
+        "policy": rule.policy if rule else DEFAULT_POLICY,
+        "rule_id": rule.id if rule else None,
+        "rewrites": [
+            {
+                "rule_id": rewrite.id,
+                "policy": rewrite.policy,
+                "rewrite_from": rewrite.rewrite_from,
+                "rewrite_to": rewrite.rewrite_to,
+            }
+            for rewrite in rewrites
+        ],
+    }
+    if rule and rule.public_comment:
+        decision["public_comment"] = rule.public_comment
+    return success(decision)
+
+
+def rules_warc_match(request):
+    """Tests a WARC name against the `warc_match` patterns of many enabled
+    rules at once.
+
+    Query string parameters:
+    warc-name -- The WARC name to test.
+    surt -- Only test the rules matching this SURT.
+    rule-id -- Only test these rules (may be repeated).
+
+    The result is the sorted list of the ids of the rules whose `warc_match`
+    matches the WARC name."""
+    warc_name = request.GET.get("warc-name")
+    if warc_name is None:
+        return error("warc-name query string param is required", {})
+    ruleset = get_ruleset()
+    rule_ids = ruleset.warc_rules
+    if request.GET.get("surt") is not None:
+        rule_ids = rule_ids.intersection(
+            rule.id for rule in ruleset.candidates(request.GET["surt"])
+        )
+    if request.GET.getlist("rule-id"):
+        try:
+            rule_ids = rule_ids.intersection(
+                int(rule_id) for rule_id in request.GET.getlist("rule-id")
+            )
+        except ValueError as e:
+            return error("rule-id query string param must be an integer", str(e))
+    return success(sorted(ruleset.warc_matcher.match(warc_name, rule_ids)))
+
+
+@etag(rules_etag)
+def rules_changes(request):
+    """Returns the changes made to the rules after a ruleset version, oldest
+    first, for clients keeping a copy of the rules up to date.
+
+    Query string parameters:
+    since -- Only return changes which created a later ruleset version
+        (default: 0), such as the version of a snapshot.
+    limit -- Return at most this many changes (and at most RULES_PAGE_SIZE).
+        The Link header of the response points to the next page, if there is
+        one.
+
+    Each change has the ruleset `version` it created, the `rule_id`, its
+    `type` (created, updated, deleted, archived or restored) and, unless the
+    rule has been deleted or archived since, the current summary of the
+    `rule`. Changes made before change versions were recorded are never
+    returned."""
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError as e:
+        return error("since query string param must be an integer", str(e))
+    try:
+        limit = _page_limit(request)
+    except ValueError as e:
+        return error("limit query string param must be a positive integer", str(e))
+    changes = list(
+        RuleChange.objects.filter(version__gt=since)
+        .order_by("version")
+        .values_list("version", "rule_id", "change_type")[: limit + 1]
+    )
+    page = changes[:limit]
+    rules = Rule.objects.in_bulk({rule_id for version, rule_id, change_type in page})
+    change_types = dict(RuleChange.TYPE_CHOICES)
+    result = []
+    for version, rule_id, change_type in page:
+        change = {
+            "version": version,
+            "rule_id": rule_id,
+            "type": change_types[change_type],
+        }
+        if change_type != "d" and rule_id in rules:
+            change["rule"] = rules[rule_id].summary()
+        result.append(change)
+    response = success(result)
+    if len(changes) > limit:
+        response["Link"] = _next_link(request, since=page[-1][0])
+    return response
+
+
+@etag(snapshot_etag)
+def rules_snapshot(request):
+    """Returns a snapshot of every enabled rule, for clients which evaluate
+    rules locally.
+
+    The snapshot is a gzip compressed file of newline delimited JSON: a
+    header with the `format_version` and `ruleset_version`, then the summary
+    of each enabled rule. Snapshots are cached on disk until the ruleset
+    version changes, and the ETag of the response is the version."""
+    try:
+        version, snapshot = get_snapshot()
+    except SnapshotError as e:
+        response = error("unable to take a consistent snapshot", str(e))
+        response.status_code = 503
+        return response
+    response = FileResponse(
+        snapshot,
+        as_attachment=True,
+        filename=os.path.basename(snapshot.name),
+        content_type="application/gzip",
+    )
+    response["ETag"] = '"snapshot-{}"'.format(version)
+    response["X-Ruleset-Version"] = str(version)
+    return response
 
 
 def rules_query(
@@ -148,7 +807,19 @@ def rules_query(
 
     from django.db.models import Q
 
-    rules_result = Rule.objects.extra(where=["%s LIKE surt"], params=[surt_qs])
+    # Find the candidate rules by their indexed match keys, and only evaluate
+    # the LIKE patterns of those with wildcards.
+    dialect = like_dialect()
+    prefixes = surt_match_prefixes(surt_qs, dialect)
+    rules_result = Rule.objects.filter(
+        Q(surt_prefix__in=prefixes)
+        & (Q(surt_has_wildcard=True) | Q(surt_prefix=prefixes[-1]))
+    ).extra(
+        where=[
+            "(NOT surt_has_wildcard OR %s LIKE surt{})".format(like_escape_sql(dialect))
+        ],
+        params=[surt_qs],
+    )
     now = datetime.now(timezone.utc)
     filters = Q()
     if enabled_only:
@@ -0,0 +1,18 @@
+"""
+ASGI config for rulesengine project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Rule lookups are served by async views (see `rulesengine.asgi_urls`), while
+the admin and the other views run as they do under WSGI.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "rulesengine.settings")
+
+application = get_asgi_application()
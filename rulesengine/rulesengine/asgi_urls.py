@@ -0,0 +1,15 @@
+"""rulesengine URL Configuration for requests served over ASGI
+
+The rule lookup routes are served by async views, and every other URL by the
+views of `rulesengine.urls`. See `rules.middleware.async_lookup_middleware`.
+"""
+
+from django.urls import path
+
+from rules import views
+from rulesengine.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path("rules/tree/<path:surt_string>", views.async_rules_for_surt),
+    path("rules/for-request", views.async_rules_for_request),
+] + sync_urlpatterns
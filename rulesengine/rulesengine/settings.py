@@ -47,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "rules.middleware.async_lookup_middleware",
+    "rules.middleware.compression_middleware",
+    "rules.middleware.sticky_primary_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,6 +92,10 @@ DATABASES = {
     }
 }
 
+# Send the reads of rule lookups and /rules to the RULES_READ_REPLICAS, and
+# everything else to the default database.
+DATABASE_ROUTERS = ["rules.routers.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -127,3 +134,80 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.1/howto/static-files/
 
 STATIC_URL = "/static/"
+
+
+# Rules engine
+
+# Resolve rule lookups with a per-process, in-memory compiled ruleset (see
+# `rules.utils.ruleset`) instead of a query of the rules table. It is rebuilt
+# when the ruleset version changes. Off by default, so a deployment opts in
+# once it has the memory for a copy of the ruleset in each worker.
+RULES_USE_SURT_MATCHER = False
+
+# How often (in seconds) each process checks the ruleset version to find out
+# whether its cached rule data is stale.
+RULES_VERSION_POLL_INTERVAL = 1.0
+
+# How many lookups a batch request to /rules/for-request resolves per query
+# when the SURT matcher is disabled.
+RULES_BATCH_CHUNK_SIZE = 250
+
+# The largest (and default) number of rules in a page of /rules.
+RULES_PAGE_SIZE = 1000
+
+# The directory /rules/snapshot caches ruleset snapshots in (by default a
+# directory in the system's temporary directory).
+RULES_SNAPSHOT_DIR = None
+
+# How many rules a /rules/bulk request writes per query.
+RULES_BULK_CHUNK_SIZE = 1000
+
+# The URLconf of requests served over ASGI, which routes rule lookups to the
+# async views.
+RULES_ASYNC_URLCONF = "rulesengine.asgi_urls"
+
+# The JSON encoder of API responses: "json" (the standard library's) or the
+# much faster "orjson", if it is installed, whose output is compact.
+RULES_JSON_ENCODER = "json"
+
+# How many compressed response bodies to keep, so responses with the same
+# ETag are compressed once. Responses are compressed with gzip, or with zstd
+# or brotli if the zstandard or brotli package is installed.
+RULES_COMPRESSION_CACHE_SIZE = 256
+
+# The aliases of the DATABASES which are read replicas of the default one,
+# which rule lookups and /rules read from. Replicas should set
+# "TEST": {"MIRROR": "default"}.
+RULES_READ_REPLICAS = []
+
+# For how long (in seconds) a client which wrote reads from the primary
+# rather than a replica, which should exceed the replication lag.
+RULES_REPLICA_STICKY_SECONDS = 10
+
+# The path of a read-only SQLite serving database of the enabled rules, built
+# by the build_serving_db command. If set, rule lookups and /rules read from
+# it (as from a read replica) instead of the database, so nodes without
+# access to the database can serve lookups by also pointing the default
+# database at it.
+RULES_SERVING_DB = None
+
+# How many bytes of the serving database SQLite memory maps.
+RULES_SERVING_DB_MMAP_SIZE = 256 * 1024 * 1024
+
+if RULES_SERVING_DB:
+    DATABASES["serving"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        # The file is replaced rather than changed, so each opened file is
+        # immutable.
+        "NAME": "file:{}?mode=ro&immutable=1".format(RULES_SERVING_DB),
+        "OPTIONS": {"uri": True},
+        "RULES_SERVING": True,
+        "TEST": {"MIRROR": "default"},
+    }
+    RULES_READ_REPLICAS = ["serving"]
+
+# For how many days a disabled rule must be left unchanged, and for how many
+# days a rule's retrieval window must have closed, before the archive_rules
+# command moves it to the archive table.
+RULES_ARCHIVE_DISABLED_DAYS = 90
+RULES_ARCHIVE_EXPIRED_DAYS = 30
@@ -29,7 +29,12 @@ admin.site.index_title = "Rules Engine Administration"
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("rules", views.RulesView.as_view()),
+    path("rules/bulk", views.rules_bulk),
     path("rules/tree/<path:surt_string>", views.rules_for_surt),
     path("rules/for-request", views.rules_for_request),
+    path("rules/decide", views.rules_decide),
+    path("rules/warc-match", views.rules_warc_match),
+    path("rules/changes", views.rules_changes),
+    path("rules/snapshot", views.rules_snapshot),
     path("rule/<int:pk>", views.RuleView.as_view()),
 ]